@@ -0,0 +1,255 @@
+"""
+Microbenchmarks of the hot paths of hacks, for tracking regressions.
+
+Times hacks.call with 0, 1 and N hooks, stealing hooks,
+access to and calls of @hacks.friendly functions,
+method calls on @hacks.friendly_class instances,
+'with hacks.use(...)' enter/exit, with and without building the registry
+(interned or not), @hacks.before/@hacks.after wrappers,
+each with and without an active registry, at several stack depths.
+
+Usage: python benchmarks/bench_hot_paths.py [-o results.json]
+                                            [--compare baseline.json]
+                                            [--depth N ...] [--lookup-mode M]
+                                            [case ...]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import hacks  # noqa: E402
+
+
+N_HOOKS = 8
+
+
+#########
+# Cases #
+#########
+# Each returns (plugins to activate, function to time).
+
+def _hooks(n):
+    def hook(i):
+        @hacks.into('point')
+        def hook():
+            return i
+        return hook
+    return [hook(i) for i in range(n)]
+
+
+def call_0_hooks():
+    return [], lambda: hacks.call.point()
+
+
+def call_1_hook():
+    return _hooks(1), lambda: hacks.call.point()
+
+
+def call_n_hooks():
+    return _hooks(N_HOOKS), lambda: hacks.call.point()
+
+
+def call_stealing():
+    @hacks.into('point')
+    @hacks.stealing
+    def hook(x=hacks.steal):
+        return x
+
+    def caller(x=1):
+        return hacks.call.point()
+    return [hook], caller
+
+
+def friendly_access():
+    @hacks.friendly('func')
+    def func():
+        return 1
+    return [], lambda: func.__name__
+
+
+def friendly_call():
+    @hacks.friendly('func')
+    def func():
+        return 1
+
+    @hacks.around('func')
+    def doubling(f):
+        return lambda: f() * 2
+    return [doubling], lambda: func()
+
+
+def friendly_class_call():
+    @hacks.friendly_class('Cls')
+    class Cls:
+        def method(self):
+            return 1
+
+    @hacks.up('Cls')
+    def extending(cls):
+        class Extended(cls):
+            def method(self):
+                return super().method() + 1
+        return Extended
+    obj = Cls()
+    return [extending], lambda: obj.method()
+
+
+def use_enter_exit():
+    @hacks.into('point')
+    def hook():
+        pass
+    registry = hacks.use(hook, only=True)
+
+    def enter_exit():
+        with registry:
+            pass
+    return [], enter_exit
+
+
+def use_interned():
+    @hacks.into('point')
+    def hook():
+        pass
+
+    def use():
+        with hacks.use(hook):  # looked up among the interned registries
+            pass
+    return [], use
+
+
+def use_construct():
+    @hacks.into('point')
+    def hook():
+        pass
+
+    def use():
+        with hacks.use(hook, interned=False):  # built from scratch
+            pass
+    return [], use
+
+
+def before_call():
+    @hacks.friendly('func')
+    def func(x):
+        return x
+
+    @hacks.before('func')
+    def checking(original, x):
+        pass
+    return [checking], lambda: func(1)
+
+
+def after_call():
+    @hacks.friendly('func')
+    def func(x):
+        return x
+
+    @hacks.after('func')
+    def checking(retval, x):
+        pass
+    return [checking], lambda: func(1)
+
+
+CASES = [call_0_hooks, call_1_hook, call_n_hooks, call_stealing,
+         friendly_access, friendly_call, friendly_class_call,
+         use_enter_exit, use_interned, use_construct,
+         before_call, after_call]
+
+
+##########
+# Timing #
+##########
+
+def at_depth(depth, func):
+    if depth:
+        return at_depth(depth - 1, func)
+    return func()
+
+
+def measure(func, depth, number, repeat):
+    """Best time per call of func, called from depth frames deeper."""
+    timer = timeit.Timer(func)
+    return at_depth(depth,
+                    lambda: min(timer.repeat(repeat=repeat, number=number)))
+
+
+def run(cases, depths, number, repeat):
+    results = []
+    for case in cases:
+        plugins, func = case()
+        for active in (False, True):
+            for depth in depths:
+                if active:
+                    with hacks.use(*plugins):
+                        t = measure(func, depth, number, repeat)
+                else:
+                    t = measure(func, depth, number, repeat)
+                results.append({'case': case.__name__, 'active': active,
+                                'depth': depth, 'usec': t / number * 1e6})
+    return results
+
+
+def environment(lookup_mode):
+    return {'lookup_mode': lookup_mode,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'gil': getattr(sys, '_is_gil_enabled', lambda: True)(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def report(results, baseline=None):
+    def key(r):
+        return r['case'], r['active'], r['depth']
+    before = {key(r): r['usec'] for r in (baseline or {}).get('results', ())}
+    print('%-20s %-8s %6s %10s %10s' % ('case', 'active', 'depth',
+                                        'usec/call', 'vs base'))
+    for r in results:
+        ratio = ('%9.2fx' % (r['usec'] / before[key(r)])
+                 if before.get(key(r)) else '')
+        print('%-20s %-8s %6d %10.3f %10s' % (r['case'], r['active'],
+                                              r['depth'], r['usec'], ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('cases', nargs='*', metavar='case',
+                        help='cases to run (default: all): ' +
+                             ', '.join(c.__name__ for c in CASES))
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('--compare', metavar='JSON',
+                        help='show ratios to previously written results')
+    parser.add_argument('--depth', type=int, action='append', dest='depths',
+                        help='stack depths (default: 0, 10, 100)')
+    parser.add_argument('--lookup-mode', default='context',
+                        choices=('context', 'frames'),
+                        help='see hacks.set_lookup_mode (default: context)')
+    parser.add_argument('--number', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    by_name = {case.__name__: case for case in CASES}
+    cases = [by_name[name] for name in args.cases] if args.cases else CASES
+    hacks.set_lookup_mode(args.lookup_mode)
+    results = run(cases, args.depths or [0, 10, 100],
+                  args.number, args.repeat)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(args.lookup_mode),
+                       'n_hooks': N_HOOKS, 'results': results}, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
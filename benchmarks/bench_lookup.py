@@ -0,0 +1,63 @@
+"""
+How the cost of finding the active registry scales with stack depth.
+
+Compares the legacy inspect.stack() scan with both lookup modes
+of hacks.set_lookup_mode(), inside and outside of 'with hacks.use(...)'.
+
+Usage: python benchmarks/bench_lookup.py [depth ...]
+"""
+
+import inspect
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import hacks  # noqa: E402
+
+
+def legacy_lookup():
+    """The pre-contextvars implementation, for reference."""
+    for frameinfo in inspect.stack():
+        if hacks.LOCALS_MARKER in frameinfo[0].f_locals:
+            registries = frameinfo[0].f_locals[hacks.LOCALS_MARKER]
+            if registries:
+                return registries[-1]
+
+
+def at_depth(depth, func):
+    if depth:
+        return at_depth(depth - 1, func)
+    return func()
+
+
+def measure(depth, lookup, number):
+    """Time per lookup, net of the cost of recursing to that depth."""
+    def best(func):
+        timer = timeit.Timer(lambda: at_depth(depth, func))
+        return min(timer.repeat(repeat=3, number=number)) / number
+    return max(best(lookup) - best(lambda: None), 0)
+
+
+def main(depths):
+    lookups = [
+        ('inspect.stack', legacy_lookup, 20),
+        ('frames', hacks.get_recent_plugins_registry, 2000),
+        ('context', hacks.get_recent_plugins_registry, 2000),
+    ]
+    print('%-14s %-8s %6s %12s' % ('lookup', 'active', 'depth', 'usec/lookup'))
+    for name, lookup, number in lookups:
+        hacks.set_lookup_mode('frames' if name == 'frames' else 'context')
+        for active in (False, True):
+            for depth in depths:
+                if active:
+                    with hacks.use():
+                        t = measure(depth, lookup, number)
+                else:
+                    t = measure(depth, lookup, number)
+                print('%-14s %-8s %6d %12.3f' % (name, active, depth, t * 1e6))
+    hacks.set_lookup_mode('context')
+
+
+if __name__ == '__main__':
+    main([int(d) for d in sys.argv[1:]] or [0, 10, 50, 200])
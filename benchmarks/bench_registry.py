@@ -0,0 +1,59 @@
+"""
+How the cost of building a registry scales with the number of hooks.
+
+Builds synthetic plugin sets of growing size
+(one class with many hooked methods, many hooked functions,
+many small class plugins) and times hacks.use(..., interned=False).
+
+Usage: python benchmarks/bench_registry.py [size ...]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import hacks  # noqa: E402
+
+
+def hooked_function(i):
+    @hacks.into('point_%d' % (i % 10))
+    def hook():
+        return i
+    hook.__name__ = hook.__qualname__ = 'hook_%d' % i
+    return hook
+
+
+def one_big_class(size):
+    methods = {'hook_%d' % i: hacks.into('point_%d' % (i % 10))(lambda self: 0)
+               for i in range(size)}
+    return [type('BigPlugin', (), methods)]
+
+
+def many_functions(size):
+    return [hooked_function(i) for i in range(size)]
+
+
+def many_classes(size):
+    return [type('Plugin%d' % i, (), {'hook': hacks.into('point')(lambda s: 0)})
+            for i in range(size)]
+
+
+def measure(plugins, number=3):
+    timer = timeit.Timer(lambda: hacks.use(*plugins, interned=False))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main(sizes):
+    print('%-16s %6s %10s %12s' % ('plugin set', 'hooks', 'msec', 'usec/hook'))
+    for name, make in (('one big class', one_big_class),
+                       ('many functions', many_functions),
+                       ('many classes', many_classes)):
+        for size in sizes:
+            t = measure(make(size))
+            print('%-16s %6d %10.3f %12.3f' % (name, size,
+                                               t * 1e3, t * 1e6 / size))
+
+
+if __name__ == '__main__':
+    main([int(s) for s in sys.argv[1:]] or [10, 100, 1000, 4000])
@@ -0,0 +1,175 @@
+"""
+How hacks scales across threads and processes.
+
+Runs the core workloads (hacks.call, a shared @hacks.friendly function,
+a shared @hacks.friendly_class, 'with hacks.use(...)' enter/exit)
+in N threads and in N processes at once. Each worker activates a registry
+of its own and checks on every iteration that it sees its own hooks only,
+so that per-thread registry isolation is verified under load.
+
+Reports throughput, speedup over a single worker and scaling efficiency
+(1.0 is linear scaling, less means contention; threads are expected
+to stay around 1/N with the GIL and to scale on free-threaded builds).
+
+Usage: python benchmarks/bench_scaling.py [-o results.json]
+                                          [--workers N ...] [--mode M ...]
+                                          [workload ...]
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import hacks  # noqa: E402
+
+
+WORKLOADS = ('call', 'friendly', 'friendly_class', 'use')
+
+
+# Shared by all the workers, along with their wrapper caches
+
+@hacks.friendly('greet')
+def greet():
+    return 'hi'
+
+
+@hacks.friendly_class('Tagged')
+class Tagged:
+    def tag(self):
+        return None
+
+
+def _plugins(wid):
+    """Hooks telling the worker wid apart from the others."""
+    @hacks.into('whoami')
+    def whoami():
+        return wid
+
+    @hacks.around('greet')
+    def greeting(func):
+        return lambda: (wid, func())
+
+    @hacks.up('Tagged')
+    def tagging(cls):
+        class TaggedForWorker(cls):
+            def tag(self):
+                return wid
+        return TaggedForWorker
+    return whoami, greeting, tagging
+
+
+def _step(workload, wid, registry):
+    """Return one iteration of a workload, returning whether it saw wid."""
+    if workload == 'call':
+        return lambda: hacks.call.whoami() == [wid]
+    if workload == 'friendly':
+        return lambda: greet() == (wid, 'hi')
+    if workload == 'friendly_class':
+        tagged = Tagged()
+        return lambda: tagged.tag() == wid
+    if workload == 'use':
+        def enter_exit():
+            with registry:
+                return hacks.call.whoami() == [wid]
+        return enter_exit
+    raise ValueError('unknown workload ' + repr(workload))
+
+
+def worker(workload, wid, iterations, barrier, results):
+    registry = hacks.use(*_plugins(wid))
+    step = _step(workload, wid, registry)
+    with registry if workload != 'use' else contextlib.nullcontext():
+        step()  # warm up the caches
+        barrier.wait()
+        start = time.time()
+        violations = sum(not step() for _ in range(iterations))
+        end = time.time()
+    # Nothing may linger in this worker once it's done
+    violations += hacks.call.whoami() != []
+    results.put((start, end, violations))
+
+
+def run_workers(mode, workload, n, iterations):
+    """Run n workers at once, return (throughput in ops/s, violations)."""
+    if mode == 'threads':
+        barrier, results = threading.Barrier(n), queue.Queue()
+        spawn = threading.Thread
+    else:
+        context = multiprocessing.get_context('spawn')
+        barrier, results = context.Barrier(n), context.Queue()
+        spawn = context.Process
+    workers = [spawn(target=worker,
+                     args=(workload, wid, iterations, barrier, results))
+               for wid in range(n)]
+    for w in workers:
+        w.start()
+    outcomes = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+    elapsed = max(end for _, end, _ in outcomes) - min(s for s, _, _ in outcomes)
+    return n * iterations / elapsed, sum(v for _, _, v in outcomes)
+
+
+def environment():
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'gil': getattr(sys, '_is_gil_enabled', lambda: True)(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('workloads', nargs='*', metavar='workload',
+                        help='workloads to run (default: all): ' +
+                             ', '.join(WORKLOADS))
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('--workers', type=int, action='append',
+                        help='numbers of workers (default: 1, 2, 4, 8, 16)')
+    parser.add_argument('--mode', action='append',
+                        choices=('threads', 'processes'),
+                        help='run workers as (default: both)')
+    parser.add_argument('--iterations', type=int, default=20000,
+                        help='per worker (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results, failed = [], False
+    print('%-10s %-15s %7s %12s %8s %10s %10s' % (
+        'mode', 'workload', 'workers', 'ops/s', 'speedup', 'efficiency',
+        'violations'))
+    for mode in args.mode or ('threads', 'processes'):
+        for workload in args.workloads or WORKLOADS:
+            single = None
+            for n in args.workers or (1, 2, 4, 8, 16):
+                throughput, violations = run_workers(mode, workload, n,
+                                                     args.iterations)
+                single = single or throughput / n
+                speedup = throughput / single
+                failed = failed or violations
+                results.append({'mode': mode, 'workload': workload,
+                                'workers': n, 'ops_per_sec': throughput,
+                                'speedup': speedup, 'efficiency': speedup / n,
+                                'violations': violations})
+                print('%-10s %-15s %7d %12.0f %8.2f %10.2f %10d' % (
+                    mode, workload, n, throughput, speedup, speedup / n,
+                    violations))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results},
+                      f, indent=1)
+    if failed:
+        sys.exit('registry isolation violated, see the violations column')
+
+
+if __name__ == '__main__':
+    main()
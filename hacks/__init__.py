@@ -21,8 +21,20 @@
 
 
 import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import copy
+import functools
+import gc
 import importlib
 import inspect
+import itertools
+import sys
+import threading
+import time
+import types
+import weakref
 
 import mutants
 
@@ -34,33 +46,169 @@ LOCALS_MARKER = '__used_hacks_registries__'
 # hacks.use, registry and active registry detection #
 #####################################################
 
-def get_recent_plugins_registry():
-    """Traverse the call stack, find most recent 'with hacks.use(...).'"""
-    for frameinfo in inspect.stack() :
-        if LOCALS_MARKER in frameinfo[0].f_locals:
-            registries = frameinfo[0].f_locals[LOCALS_MARKER]
-            if not registries:
-                continue
+# The stack of active registries, as (owner thread ident, tuple of
+# _Activation). The owner is recorded so that a context inherited by another
+# thread (e.g. on free-threaded builds) doesn't leak the registries into it.
+_active_registries = contextvars.ContextVar('hacks_active_registries',
+                                            default=(None, ()))
+
+# Frames that can get suspended with their 'with hacks.use(...)' still open.
+# Coroutines are left out: their registries are meant to follow the context
+# into the tasks they start, while they are suspended awaiting them.
+_GENERATOR_FLAGS = inspect.CO_GENERATOR | inspect.CO_ASYNC_GENERATOR
+
+
+class _Activation:
+    """
+    A registry activated by a frame, shared by every context inheriting it,
+    so that exiting in any thread or context deactivates it everywhere.
+    """
+    __slots__ = ('registry', 'generator_frame', 'active', 'marked_in')
+
+    def __init__(self, registry, frame):
+        self.registry = registry
+        self.generator_frame = (frame if frame.f_code.co_flags &
+                                _GENERATOR_FLAGS else None)
+        self.active = True
+        # Remember the set of the thread marking the frame, not the one
+        # that will deactivate it, e.g. by closing a generator
+        self.marked_in = getattr(_marked_frames, 'activations', None)
+        if self.marked_in is None:
+            self.marked_in = _marked_frames.activations = set()
+        self.marked_in.add(self)
+        if self.generator_frame is not None:
+            _generator_activations.add(self)
+
+    def deactivate(self):
+        if self.generator_frame is not None:
+            _generator_activations.discard(self)
+        self.active, self.generator_frame = False, None
+        self.marked_in.discard(self)
+
+
+# Per-thread set of _Activation marking frames with LOCALS_MARKER, used to
+# answer 'no registry anywhere' without walking the stack in unhooked threads.
+_marked_frames = threading.local()
+
+# _Activation made by generator frames, in all threads: a generator can be
+# resumed in a thread other than the one that has entered its 'with'.
+_generator_activations = set()
+
+
+def _running_here(frame):
+    """Tell whether a generator frame is running in the current thread."""
+    if frame.f_back is None:
+        return False  # suspended
+    caller = sys._getframe(1)
+    while caller is not None:
+        if caller is frame:
+            return True
+        caller = caller.f_back
+    return False
+
+
+def _lookup_in_generators():
+    """
+    Find the registry of a generator running in the current thread,
+    which the context doesn't know about, e.g. resumed in another thread.
+    """
+    frames = {activation.generator_frame
+              for activation in tuple(_generator_activations)}
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame in frames:
+            registries = frame.f_locals.get(LOCALS_MARKER)
+            if registries:
+                return registries[-1]
+        frame = frame.f_back
+
+
+def _lookup_in_context():
+    owner, activations = _active_registries.get()
+    if activations and owner == threading.get_ident():
+        for activation in reversed(activations):
+            if activation.active:
+                # skip the generators suspended in the middle of their 'with'
+                # or resumed in another thread
+                frame = activation.generator_frame
+                if frame is None or _running_here(frame):
+                    return activation.registry
+    if _generator_activations:
+        return _lookup_in_generators()
+
+
+def _lookup_in_frames():
+    if not (getattr(_marked_frames, 'activations', None) or
+            _generator_activations):  # maybe resumed in this thread
+        return None
+    frame = sys._getframe(1)
+    while frame is not None:
+        registries = frame.f_locals.get(LOCALS_MARKER)
+        if registries:
             return registries[-1]
+        frame = frame.f_back
+
+
+_lookup = _lookup_in_context
+_LOOKUP_MODES = {'context': _lookup_in_context, 'frames': _lookup_in_frames}
+
+
+def set_lookup_mode(mode):
+    """
+    Choose how get_recent_plugins_registry finds the active registry.
+    'context' (default): a context-local stack, constant time;
+    follows contextvars, e.g. into asyncio tasks.
+    'frames': walk the raw call stack up to the nearest frame
+    marked with LOCALS_MARKER, strictly scoped to the current call stack.
+    In both, a suspended generator's 'with hacks.use(...)' doesn't leak out.
+    """
+    global _lookup
+    if mode not in _LOOKUP_MODES:
+        raise ValueError('unknown lookup mode ' + repr(mode) +
+                         ', expected one of ' + ', '.join(_LOOKUP_MODES))
+    _lookup = _LOOKUP_MODES[mode]
+
+
+def get_recent_plugins_registry():
+    """Return the registry of the most recent 'with hacks.use(...)'."""
+    return _lookup()
+
+
+def _frameinfo(frame):
+    """Build an inspect.FrameInfo for a single frame, like inspect.stack()."""
+    return inspect.FrameInfo(frame, *inspect.getframeinfo(frame))
 
 
 class _PluginRegistry:
     """A registry of plugins."""
-    def __init__(self, hacks_iterable, package=None, _prev_hacks=None):
-        self._prev_hacks_list = list(_prev_hacks) if _prev_hacks else []
+    def __init__(self, hacks_iterable, package=None, _parent=None):
+        # Only the new hacks get registered here, inherited ones are
+        # looked up through the _parent chain, see _lineage and _hooks.
+        self._parent = _parent
         self._requested_hacks_list = list(hacks_iterable)
         self._new_hacks_list = []
+        self._new_hacks_ids = set()  # identities of _new_hacks_list items
+        self._new_hacks_types = set()  # and their types
         self._hacks_into = collections.defaultdict(list)
         self._hacks_around = collections.defaultdict(list)
         self._hacks_up = collections.defaultdict(list)
         self._package = package
 
-        for hack in self._prev_hacks_list + self._requested_hacks_list:
+        for hack in self._requested_hacks_list:
             self._register(hack)
 
-        self._hacks_list = self._prev_hacks_list + self._new_hacks_list
+        self._dispatchers = _Dispatchers(self)
+        self._iterators = _Dispatchers(self, '_compile_iterator')
+        self._entries = _Dispatchers(self, '_compile_entries')
+        self._wrapper_caches = weakref.WeakSet()  # that wrapped for us
+        self._activations = {}  # {id(frame): [_Activation, ...]}, see _push
+        self._lazy_registries = {}  # {_LazyHack: registry importing it}
+        self._interned = False  # by hacks.use, to be reused
+        _registries.add(self)
 
-        self.call = _CallProxy(self)
+    @property
+    def call(self):
+        return _CallProxy(self)
 
     def _resolve(self, hack):
         if isinstance(hack, str):
@@ -72,14 +220,44 @@ class _PluginRegistry:
                 hack = getattr(hack, part)
         return hack
 
+    def _lineage(self):
+        """Yield this registry and the ones it inherits from, innermost first."""
+        registry = self
+        while registry is not None:
+            yield registry
+            registry = registry._parent
+
+    def _own_hooks(self, table_name, name):
+        """Return what's hooked to name in a table of this very registry."""
+        hooks = tuple(getattr(self, table_name).get(name, ()))
+        if any(isinstance(hook, _LazyHack) for hook in hooks):
+            hooks = tuple(h for hook in hooks
+                          for h in (hook._hooks(table_name, name, self)
+                                    if isinstance(hook, _LazyHack)
+                                    else (hook,)))
+        return hooks
+
+    def _hooks(self, table_name, name):
+        """Return what's hooked to name in a table, inherited hooks first."""
+        hooks = ()
+        for registry in self._lineage():
+            hooks = registry._own_hooks(table_name, name) + hooks
+        return hooks
+
     def _already_registered(self, hack):
         hack = self._resolve(hack)
-        registered_hacks = self._prev_hacks_list + self._new_hacks_list
 
         if inspect.isclass(hack):
-            return any(isinstance(reg, hack) for reg in registered_hacks)
+            return any(issubclass(reg_type, hack)
+                       for registry in self._lineage()
+                       for reg_type in registry._new_hacks_types)
         else:
-            return any(reg is hack for reg in registered_hacks)
+            return self._registered(hack)
+
+    def _registered(self, hack):
+        hack_id = _identity(hack)
+        return any(hack_id in registry._new_hacks_ids
+                   for registry in self._lineage())
 
     def _register(self, hack, recursively=True):
         """Register a hack and remember its modifications."""
@@ -108,109 +286,432 @@ class _PluginRegistry:
                 hack = hack()
             self._register_attributes(hack)
 
-        if hack not in (self._prev_hacks_list + self._new_hacks_list):
+        if not self._registered(hack):
             self._new_hacks_list.append(hack)
+            self._new_hacks_ids.add(_identity(hack))
+            self._new_hacks_types.add(type(hack))
 
     def _register_attributes(self, hack):
         """Also register methods and methods of inner classes."""
-        for attrname, attr in inspect.getmembers(hack, inspect.isroutine):
-            if not attrname.startswith('__'):
-                self._register(attr, recursively=False)
-        for attrname, attr in inspect.getmembers(hack, inspect.isclass):
-            if not attrname.startswith('__'):
-                self._register(attr, recursively=True)
-
-    def _call_by_name(self, callable_name, *a, **kwa):
-        """Return a list of execution results for all applicable methods."""
-        # Possibly a hot function, TODO: optimize
-
-        # Rarely-used context stealing:
-        frameinfo = inspect.stack()[2]  # 1 from here, 1 from _CallProxy's lambda
-
-        callables = self._hacks_into[callable_name]
-        return [self._call_with_extra_hacks(clb, frameinfo, *a, **kwa)
-                for clb in callables]
-
-    def _call_with_extra_hacks(self, clb, frameinfo, *a, **kwa):
-        if hasattr(clb, '__hacks_stealer__'):
-            sig = inspect.signature(clb)
-            bound_args = sig.bind_partial(*a, **kwa)
-            for param_name, param in sig.parameters.items():
-                if param_name in bound_args.arguments:
-                    continue  # provided by someone else
-                try:
-                    if (param.default is _Steal or
-                        param.annotation is _Steal):
-                        caller_locals = frameinfo[0].f_locals
-                        kwa[param_name] = caller_locals[param_name]
-                    elif (isinstance(param.default, _Steal) or
-                          isinstance(param.annotation, _Steal)):
-                        caller_locals = frameinfo[0].f_locals
-                        kwa[param_name] = caller_locals[param.default._name]
-                    elif (isinstance(param.default, _StealFrameInfo) or
-                          isinstance(param.annotation, _StealFrameInfo)):
-                        kwa[param_name] = frameinfo
-                except KeyError as ke:
-                    avail = ', '.join('\'' + k + '\'' for k in caller_locals.keys())
-                    text = ke.args[0] + ' (available: ' + avail + ')'
-                    raise NameError(text)
-        return clb(*a, **kwa)
-
-    def __enter__(self):
+        routines, classes = _member_layout(type(hack))
+        routines = [getattr(hack, attrname) for attrname in routines]
+        classes = [getattr(hack, attrname) for attrname in classes]
+
+        own_attrnames = [attrname for attrname in getattr(hack, '__dict__', ())
+                         if not attrname.startswith('__')]
+        if own_attrnames:  # instance or module attributes, not memoized
+            routines, classes = [], []
+            for attrname in sorted(set(own_attrnames).union(
+                    *_member_layout(type(hack)))):
+                attr = getattr(hack, attrname)
+                if inspect.isclass(attr):
+                    classes.append(attr)
+                elif inspect.isroutine(attr) and _is_marked(attr):
+                    routines.append(attr)
+
+        for attr in routines:
+            self._register(attr, recursively=False)
+        for attr in classes:
+            self._register(attr, recursively=True)
+
+    def _compile_dispatcher(self, callable_name):
         """
-        Store in call stack for lookup with get_recent_plugins_registry.
-        Call __on_enter__ on hacks in forward order.
+        Build a function returning a list of execution results
+        for all callables hooked into callable_name.
+        """
+        callables = self._hooks('_hacks_into', callable_name)
+        executor = _executors.get(callable_name)
+        if callables and executor is not None:
+            entries = self._entries[callable_name]
+
+            def fan_out(frame, a, kwa):
+                # keeps the registry alive for as long as the dispatcher
+                return _fan_out(self, entries, executor, frame, a, kwa)
+            if _stats is not None:
+                return _stats._parallel_dispatcher(callable_name,
+                                                   len(entries), fan_out)
+
+            def parallel_dispatch(*a, **kwa):
+                return fan_out(sys._getframe(1), a, kwa)
+            return parallel_dispatch
+        if _stats is not None:
+            return _stats._dispatcher(callable_name, callables)
+        if not callables:
+            return _call_nothing
+        plans = tuple(_bound_steal_plan(clb) for clb in callables)
+
+        if not any(plans):
+            def dispatch(*a, **kwa):
+                return [clb(*a, **kwa) for clb in callables]
+            return dispatch
+
+        entries = tuple(zip(callables, plans))
+
+        def stealing_dispatch(*a, **kwa):
+            # Rarely-used context stealing:
+            frame = sys._getframe(1)
+            return [_call_stealing(clb, plan, frame, a, kwa) if plan
+                    else clb(*a, **kwa)
+                    for clb, plan in entries]
+        return stealing_dispatch
+
+    def _compile_iterator(self, callable_name):
+        """
+        Build a generator function yielding execution results
+        for the callables hooked into callable_name one by one,
+        taking the caller frame to steal from, the args and the kwargs.
+        """
+        stats = _stats
+        entries = tuple((stats._counted(callable_name, clb) if stats else clb,
+                         _bound_steal_plan(clb))
+                        for clb in self._hooks('_hacks_into', callable_name))
+
+        def iterate(frame, a, kwa):
+            for clb, plan in entries:
+                if plan:
+                    yield _call_stealing(clb, plan, frame, a, kwa)
+                else:
+                    yield clb(*a, **kwa)
+        if stats is not None:
+            return stats._iterator(callable_name, len(entries), iterate)
+        return iterate
+
+    def _compile_entries(self, callable_name):
+        """
+        Return (callable, steal plan, batch form or None) for the callables
+        hooked into callable_name, see hacks.call_map and hacks.acall.
         """
-        frameinfo = inspect.stack()[1]
-        loc = frameinfo[0].f_locals
+        entries, stats = [], _stats
+        for clb in self._hooks('_hacks_into', callable_name):
+            batch_form = getattr(clb, '__hacks_batch__', None)
+            if batch_form is not None and inspect.ismethod(clb):
+                batch_form = batch_form.__get__(clb.__self__)
+            plan = _bound_steal_plan(clb)
+            if stats is not None:
+                if batch_form is not None:
+                    batch_form = stats._counted(callable_name, clb,
+                                                batch_form=batch_form)
+                clb = stats._counted(callable_name, clb)
+            entries.append((clb, plan, batch_form))
+        return tuple(entries)
+
+    def _push(self, frame):
+        """Make the registry active and mark the frame that activated it."""
+        activation = _Activation(self, frame)
+        self._activations.setdefault(id(frame), []).append(activation)
+        thread = threading.get_ident()
+        owner, activations = _active_registries.get()
+        if owner != thread:
+            activations = ()
+        _active_registries.set((thread, activations + (activation,)))
+
+        loc = frame.f_locals
         if LOCALS_MARKER in loc:
             loc[LOCALS_MARKER].append(self)
         else:
             loc[LOCALS_MARKER] = [self]
 
+    def _pop(self, frame):
+        """Undo _push, in whatever thread or context it happens."""
+        frame_activations = self._activations[id(frame)]
+        activation = frame_activations.pop()
+        if not frame_activations:
+            del self._activations[id(frame)]
+        activation.deactivate()
+
+        owner, activations = _active_registries.get()
+        if activations and activations[-1] is activation:
+            _active_registries.set((owner, activations[:-1]))
+        elif activation in activations:
+            # exited out of order, e.g. by a generator; drop the others
+            # deactivated from foreign contexts while at it
+            _active_registries.set((owner, tuple(a for a in activations
+                                                 if a.active)))
+        # else: exited from a foreign context, e.g. a generator closed
+        # in another thread, deactivated in place
+
+        loc = frame.f_locals
+        assert LOCALS_MARKER in loc
+        assert loc[LOCALS_MARKER][-1] == self
+        loc[LOCALS_MARKER].pop()
+        if not loc[LOCALS_MARKER]:
+            del loc[LOCALS_MARKER]
+
+    def __enter__(self):
+        """
+        Make active for lookup with get_recent_plugins_registry.
+        Call __on_enter__ on hacks in forward order.
+        """
+        frame = sys._getframe(1)
+        self._push(frame)
+
         # Call __on_enter__ for hacks in forward order:
+        frameinfo = None
         for hack in self._new_hacks_list:
             if hasattr(hack, '__on_enter__'):
+                frameinfo = frameinfo or _frameinfo(frame)
                 hack.__on_enter__(frameinfo)
 
     def __exit__(self, type_, value, traceback):
         """
-        Remove marker from the call stack.
+        Make inactive, remove marker from the call stack.
         Call __on_exit__ on hacks in reverse order.
         """
-        frameinfo = inspect.stack()[1]
-        loc = frameinfo[0].f_locals
-        assert LOCALS_MARKER in loc
-        assert loc[LOCALS_MARKER][-1] == self
-        loc[LOCALS_MARKER].pop()
-        if not loc[LOCALS_MARKER]:
-            del loc[LOCALS_MARKER]
+        frame = sys._getframe(1)
+        self._pop(frame)
 
         # Call __on_exit__ for hacks in reverse order:
+        frameinfo = None
         for hack in reversed(self._new_hacks_list):
             if hasattr(hack, '__on_exit__'):
+                frameinfo = frameinfo or _frameinfo(frame)
                 hack.__on_exit__(frameinfo)
 
-    def _apply_hacks_around(self, clb, names_for_hacks_around):
-        for name_for_hacks_around in names_for_hacks_around:
-            for hack in self._hacks_around[name_for_hacks_around]:
-                clb = hack(clb)
+        # Nobody is going to reuse what was wrapped for us, release it now:
+        if not self._interned and not self._activations:
+            self._release_wrappers()
+
+    def __reduce__(self):
+        """
+        Pickle as the hacks used, to be used again on unpickling,
+        e.g. in a worker process. Their __on_enter__ won't be called there.
+        """
+        lineage = [(registry._requested_hacks_list, registry._package)
+                   for registry in self._lineage()]
+        return _unpickle_registry, (lineage[::-1],)
+
+    def _release_wrappers(self):
+        """Make friendly objects and classes forget what they wrapped for us."""
+        for cache in list(self._wrapper_caches):
+            cache.pop(self, None)
+        self._wrapper_caches.clear()
+
+    def _layers(self, table_name, names, original, cache, cached_wrapped):
+        """
+        Decide what to start wrapping from and which hacks to apply on top:
+        the object already wrapped for the parent registry and our own hacks
+        if that keeps the order of names, or the original and all the hacks.
+        """
+        own = [self._own_hooks(table_name, name) for name in names]
+        if self._parent is None:
+            return original, [hack for hacks in own for hack in hacks]
+        inherited = [self._parent._hooks(table_name, name) for name in names]
+        if not any(inherited):
+            return original, [hack for hacks in own for hack in hacks]
+        own_from = next((i for i, hacks in enumerate(own) if hacks), len(own))
+        inherited_upto = max(i for i, hacks in enumerate(inherited) if hacks)
+        if own_from >= inherited_upto:
+            wrapped = cached_wrapped(cache, original, names, self._parent)
+            return wrapped, [hack for hacks in own for hack in hacks]
+        return original, [hack for i in range(len(names))
+                          for hack in inherited[i] + own[i]]
+
+    def _apply_hacks_around(self, clb, names_for_hacks_around, cache):
+        original, profiler = clb, _profiler
+        clb, hacks = self._layers('_hacks_around', names_for_hacks_around,
+                                  clb, cache, _cached_effective_wrapped_object)
+        if profiler is not None and clb is original:
+            clb = profiler._layer(clb, clb)
+        for hack in hacks:
+            clb = hack(clb)
+            if profiler is not None:
+                clb = profiler._layer(clb, hack)
         return clb
 
-    def _apply_hacks_up(self, cls, names_for_hacks_up):
-        for name_for_hacks_up in names_for_hacks_up:
-            for hack in self._hacks_up[name_for_hacks_up]:
-                cls = hack(cls)
+    def _apply_hacks_up(self, cls, names_for_hacks_up, cache):
+        original, profiler = cls, _profiler
+        cls, hacks = self._layers('_hacks_up', names_for_hacks_up,
+                                  cls, cache, _cached_effective_wrapped_up_class)
+        if profiler is not None and cls is original:
+            cls = profiler._class_layer(cls, cls)
+        for hack in hacks:
+            cls = hack(cls)
+            if profiler is not None:
+                cls = profiler._class_layer(cls, hack)
         return cls
 
 
-def use(*a, only=False, package=None):
-    prev_hacks = None
-    if not only:
-        prev_registry = get_recent_plugins_registry()
-        if prev_registry:
-            prev_hacks = prev_registry._hacks_list
-    return _PluginRegistry(a, _prev_hacks=prev_hacks, package=package)
+_HACK_MARKERS = ('__hacks_into__', '__hacks_around__', '__hacks_up__',
+                 '__hacks_on_top_of__', '__on_enter__', '__on_exit__')
+
+
+def _is_marked(attr):
+    return any(hasattr(attr, marker) for marker in _HACK_MARKERS)
+
+
+# All the registries alive, e.g. to recompile their dispatchers
+_registries = weakref.WeakSet()
+
+
+_member_layouts = weakref.WeakKeyDictionary()
+
+
+def _member_layout(cls):
+    """
+    Names of the attributes of cls instances to register along with them:
+    routines marked as hacks and inner classes. Introspected once per class.
+    """
+    try:
+        return _member_layouts[cls]
+    except KeyError:
+        pass
+    routines, classes = [], []
+    for attrname, attr in inspect.getmembers(cls):
+        if attrname.startswith('__'):
+            continue
+        if inspect.isclass(attr):
+            classes.append(attrname)
+        elif inspect.isroutine(attr) and _is_marked(attr):
+            routines.append(attrname)
+    layout = _member_layouts[cls] = (tuple(routines), tuple(classes))
+    return layout
+
+
+def _identity(hack):
+    """Identify a hack; bound methods are recreated on every access."""
+    if inspect.ismethod(hack):
+        return id(hack.__self__), id(hack.__func__)
+    return id(hack)
+
+
+class _Dispatchers(dict):
+    """A cache of dispatchers of a registry, compiled on first use."""
+    def __init__(self, registry, compile_method='_compile_dispatcher'):
+        self._registry = weakref.ref(registry)  # don't keep it from dying
+        self._compile_method = compile_method
+
+    def __missing__(self, callable_name):
+        registry = self._registry()
+        dispatcher = getattr(registry, self._compile_method)(callable_name)
+        self[callable_name] = dispatcher
+        return dispatcher
+
+
+def _unpickle_registry(lineage):
+    registry = None
+    for requested_hacks, package in lineage:
+        registry = _use(requested_hacks, package, registry, interned=True)
+    return registry
+
+
+# Registries built by hacks.use, reused when the same hacks are used again
+# on top of the same parent registry. Least recently used ones get evicted.
+_interned_registries = collections.OrderedDict()
+_interned_registries_lock = threading.Lock()
+_INTERNED_REGISTRIES_MAX = 256
+
+
+def use(*a, only=False, package=None, interned=True):
+    """
+    Return a registry of hacks, to be activated with 'with'.
+    Unless only=True, hacks of the currently active registry are inherited.
+
+    Registries are interned: using the same hacks on top of the same parent
+    returns the same registry, with its compiled tables, instantiated
+    class hacks and objects pre-wrapped for it.
+    Pass interned=False or mark hacks with @hacks.stateful to opt out.
+    """
+    return _use(a, package, None if only else _lookup(), interned)
+
+
+def _use(a, package, parent, interned):
+    if not interned:
+        return _PluginRegistry(a, package=package, _parent=parent)
+
+    key = (tuple(h if isinstance(h, str) else id(h) for h in a),
+           package, id(parent))
+    with _interned_registries_lock:
+        registry = _interned_registries.get(key)
+        if registry is not None:
+            _interned_registries.move_to_end(key)
+            return registry
+
+    registry = _PluginRegistry(a, package=package, _parent=parent)
+    if any(getattr(h, '__hacks_stateful__', False)
+           for h in registry._new_hacks_list):
+        return registry
+    with _interned_registries_lock:
+        registry = _interned_registries.setdefault(key, registry)
+        registry._interned = True
+        while len(_interned_registries) > _INTERNED_REGISTRIES_MAX:
+            _, evicted = _interned_registries.popitem(last=False)
+            evicted._interned = False  # releases wrappers on next exit
+    return registry
+
+
+def stateful(hack):
+    """
+    Decorate a hack that keeps per-registry state,
+    so that registries using it are never reused by hacks.use.
+    """
+    hack.__hacks_stateful__ = True
+    return hack
+
+
+#########################
+# Lazily imported hacks #
+#########################
+
+class _LazyHack:
+    """
+    A hack specified as 'module:attr', declared to serve some names,
+    that is imported only when something hooked to one of them is needed.
+    Its own __on_enter__, __on_exit__ and __hacks_on_top_of__ are ignored.
+    """
+    __slots__ = ('_spec', '_package', '_lock',
+                 '__hacks_into__', '__hacks_around__', '__hacks_up__',
+                 '__hacks_stateful__')
+
+    def __init__(self, spec, into=(), around=(), up=(), package=None,
+                 stateful=False):
+        self._spec, self._package = spec, package
+        self._lock = threading.Lock()
+        self.__hacks_into__ = tuple(into)
+        self.__hacks_around__ = tuple(around)
+        self.__hacks_up__ = tuple(up)
+        self.__hacks_stateful__ = stateful
+
+    def __repr__(self):
+        return '<lazy hack ' + self._spec + '>'
+
+    def __reduce__(self):
+        return lazy, (self._spec, self.__hacks_into__, self.__hacks_around__,
+                      self.__hacks_up__, self._package,
+                      self.__hacks_stateful__)
+
+    def _hooks(self, table_name, name, registry):
+        """
+        Import the hack if not yet, return what it hooks to name
+        for a registry using it, through a private one made for that registry,
+        so that class hacks get instantiated once per registry using them.
+        """
+        with self._lock:
+            private = registry._lazy_registries.get(self)
+            if private is None:
+                private = _PluginRegistry(
+                    [self._spec], package=self._package or registry._package)
+                registry._lazy_registries[self] = private
+        return private._hooks(table_name, name)
+
+
+_lazy_hacks = {}
+
+
+def lazy(spec, into=(), around=(), up=(), package=None, stateful=False):
+    """
+    Declare which names a hack specified as 'module:attr' serves,
+    so that hacks.use(hacks.lazy(...)) doesn't import it right away,
+    but only on the first hacks.call, friendly object access or class hop
+    that needs something it hooks to one of these names.
+    Its __on_enter__/__on_exit__ and @hacks.on_top_of are ignored,
+    and so is @hacks.stateful: pass stateful=True instead.
+    Declaring the same thing twice returns the same object.
+    """
+    key = (spec, tuple(into), tuple(around), tuple(up), package, stateful)
+    try:
+        return _lazy_hacks[key]
+    except KeyError:
+        return _lazy_hacks.setdefault(key, _LazyHack(*key))
 
 
 ##############################
@@ -235,29 +736,300 @@ class _CallProxy():
     A class that proxies calls to hacks, allowing hacks.call.some_func().
     Proxies most calls to all plugging clients, returns all results.
     Automatically determines active hacks registry.
+    With collect, returns collect(an iterator over the results) instead,
+    running the hooks only as far as collect iterates.
     """
-    def __init__(self, registry=None):
+    def __init__(self, registry=None, collect=None):
         self._registry = registry
+        self._collect = collect
 
     def __getattr__(self, name):
         """Proxy a call to all implementation callables"""
-        # Possibly a hot function, TODO: optimize
-        registry = self._registry or get_recent_plugins_registry()
-        if not registry:
-            return lambda *a, **kwa: []
-        return lambda *a, **kwa: registry._call_by_name(name, *a, **kwa)
+        registry = self._registry or _lookup()
+        collect = self._collect
+        if collect is None:
+            if not registry:
+                return _call_nothing
+            return registry._dispatchers[name]
+
+        iterate = registry._iterators[name] if registry else _iterate_nothing
+        def collecting_dispatch(*a, **kwa):
+            return collect(iterate(sys._getframe(1), a, kwa))
+        return collecting_dispatch
 
 
 call = _CallProxy()
 
 
+def _call_nothing(*a, **kwa):
+    """The dispatcher for plugging points nobody hooked into."""
+    return []
+
+
+def _iterate_nothing(frame, a, kwa):
+    return iter(())
+
+
+def _first(results):
+    return next((result for result in results if result is not None), None)
+
+
+# hacks.call variants, calling the hooks only until the answer is known:
+call_iter = _CallProxy(collect=iter)  # returns an iterator over the results
+call_first = _CallProxy(collect=_first)  # returns the first non-None one
+call_any = _CallProxy(collect=any)  # returns True on the first truthy one
+call_all = _CallProxy(collect=all)  # returns False on the first falsy one
+
+
+def call_reduce(function, initial):
+    """
+    Return a hacks.call variant folding the results with function,
+    e.g. hacks.call_reduce(operator.add, 0).some_func() sums them up.
+    """
+    return _CallProxy(collect=lambda results: functools.reduce(function,
+                                                               results,
+                                                               initial))
+
+
+class _CallMapProxy():
+    """
+    A class allowing hacks.call_map.some_func(xs, ys, ...),
+    hacks.call.some_func mapped over argument sets like map() does,
+    with the registry and the hooks looked up once.
+    """
+    def __init__(self, registry=None):
+        self._registry = registry
+
+    def __getattr__(self, name):
+        registry = self._registry or _lookup()
+        entries = registry._entries[name] if registry else ()
+        def map_dispatch(*iterables, batch_size=_CALL_MAP_BATCH_SIZE, **kwa):
+            """
+            Yield the list of results of hacks.call.<name>(x, y, ..., **kwa)
+            for each x, y, ... of the iterables.
+            Hooks are called for batches of up to batch_size argument sets,
+            one hook after another.
+            """
+            if batch_size < 1:
+                raise ValueError('batch_size should be at least 1, got ' +
+                                 repr(batch_size))
+            results = _call_map(entries, sys._getframe(1), zip(*iterables),
+                                batch_size, kwa)
+            if _stats is not None and registry:
+                return _stats._counting(name, len(entries), results)
+            return results
+        return map_dispatch
+
+
+_CALL_MAP_BATCH_SIZE = 256
+
+call_map = _CallMapProxy()
+
+
+def _call_map(entries, frame, arg_sets, batch_size, kwa):
+    while True:
+        batch = list(itertools.islice(arg_sets, batch_size))
+        if not batch:
+            return
+        if not entries:
+            yield from ([] for _ in batch)
+            continue
+        columns, hooks_results = None, []
+        for clb, plan, batch_form in entries:
+            if batch_form is not None:
+                if columns is None:
+                    columns = [list(column) for column in zip(*batch)]
+                results = list(batch_form(*columns, **kwa))
+                if len(results) != len(batch):
+                    raise ValueError('batch form of ' + repr(clb) +
+                                     ' returned ' + str(len(results)) +
+                                     ' results for ' + str(len(batch)))
+            elif plan:
+                results = [_call_stealing(clb, plan, frame, a, kwa)
+                           for a in batch]
+            else:
+                results = [clb(*a, **kwa) for a in batch]
+            hooks_results.append(results)
+        for results in zip(*hooks_results):
+            yield list(results)
+
+
+def batched(batch_form):
+    """
+    Decorate a function/method hooked with @hacks.into with its batch form,
+    taking lists of argument values (one list per positional argument)
+    and returning the list of results,
+    so that hacks.call_map calls it once per batch instead.
+    The batch form of a method should be a method of the same class.
+    Works internally by setting __hacks_batch__ on the decorated callable.
+    """
+    def batched_decorator(func):
+        func.__hacks_batch__ = batch_form
+        return func
+    return batched_decorator
+
+
+class _AsyncCallProxy():
+    """
+    A class allowing 'await hacks.acall.some_func()',
+    running the hooks concurrently as asyncio tasks and awaiting
+    what they return if it's awaitable, e.g. for coroutine function hooks.
+    Results are returned in the same order as hacks.call.some_func() does.
+    hacks.acall(timeout=..., return_exceptions=True).some_func()
+    makes it give up on the hooks not done in time, raising
+    asyncio.TimeoutError, and return the exceptions raised by hooks
+    (or asyncio.TimeoutError instances for the ones timed out)
+    in place of their results instead of raising the first one.
+    """
+    def __init__(self, registry=None, timeout=None, return_exceptions=False):
+        self._registry = registry
+        self._timeout = timeout
+        self._return_exceptions = return_exceptions
+
+    def __call__(self, timeout=None, return_exceptions=False):
+        return _AsyncCallProxy(self._registry, timeout, return_exceptions)
+
+    def __getattr__(self, name):
+        registry = self._registry or _lookup()
+        entries = registry._entries[name] if registry else ()
+        timeout, return_exceptions = self._timeout, self._return_exceptions
+        def async_dispatch(*a, **kwa):
+            frame = sys._getframe(1)
+            # Stealing is done right away, the caller won't wait for the tasks
+            calls = [(clb, _stolen_kwargs(plan, frame, a, kwa) if plan else kwa)
+                     for clb, plan, _ in entries]
+            awaitable = _acall(registry, calls, a, timeout, return_exceptions)
+            if _stats is not None and registry:
+                return _stats._counting_awaitable(name, len(entries),
+                                                  awaitable)
+            return awaitable
+        return async_dispatch
+
+
+acall = _AsyncCallProxy()
+
+
+async def _acall_one(registry, clb, a, kwa):
+    """Call a hook with the registry active, await what it returns."""
+    # Mark this frame, not just the context, so that the registry is found
+    # in 'frames' lookup mode too, where the task stack lacks the caller's
+    frame = sys._getframe()
+    registry._push(frame)
+    try:
+        result = clb(*a, **kwa)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+    finally:
+        registry._pop(frame)
+
+
+async def _acall(registry, calls, a, timeout, return_exceptions):
+    import asyncio  # here, as it takes longer to import than hacks itself
+    if not calls:
+        return []
+    tasks = [asyncio.ensure_future(_acall_one(registry, clb, a, kwa))
+             for clb, kwa in calls]
+    try:
+        await asyncio.wait(tasks, timeout=timeout,
+                           return_when=(asyncio.ALL_COMPLETED
+                                        if return_exceptions
+                                        else asyncio.FIRST_EXCEPTION))
+    finally:  # timed out, failed or cancelled ourselves
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:  # let them handle the cancellation
+            await asyncio.wait(pending)
+
+    if not return_exceptions:
+        for task in tasks:
+            if task not in pending and task.exception() is not None:
+                raise task.exception()
+        if pending:
+            raise asyncio.TimeoutError()
+        return [task.result() for task in tasks]
+    return [asyncio.TimeoutError() if task in pending else
+            task.exception() if task.exception() is not None else
+            task.result()
+            for task in tasks]
+
+
 def stealing(clb):
-    """For use with hacks.into only for now. TODO: generalize"""
-    clb.__hacks_stealer__ = None
-    # the presence of the argument is important, the value is not
+    """
+    For use with hacks.into only for now. TODO: generalize
+    Works internally by storing a steal plan as __hacks_stealer__.
+    """
+    clb.__hacks_stealer__ = _steal_plan(clb)
     return clb
 
 
+def _steal_plan(clb):
+    """
+    Precompute what to steal for a callable as a tuple of
+    (parameter name, its positional index or None, caller local name),
+    the local name being None for parameters getting the frameinfo.
+    """
+    plan = []
+    position = 0
+    for param_name, param in inspect.signature(clb).parameters.items():
+        if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            param_position, position = position, position + 1
+        else:
+            param_position = None
+        for marker in (param.default, param.annotation):
+            if marker is _Steal:
+                plan.append((param_name, param_position, param_name))
+            elif isinstance(marker, _Steal):
+                plan.append((param_name, param_position,
+                             marker._name or param_name))
+            elif isinstance(marker, _StealFrameInfo):
+                plan.append((param_name, param_position, None))
+            else:
+                continue
+            break
+    return tuple(plan)
+
+
+def _bound_steal_plan(clb):
+    """Return the steal plan for a callable as registered, if it steals."""
+    if not hasattr(clb, '__hacks_stealer__'):
+        return None
+    plan = clb.__hacks_stealer__
+    if plan is None:  # flagged by hand, not with @hacks.stealing
+        return _steal_plan(clb)
+    if inspect.ismethod(clb):  # 'self' is already bound, shift positions
+        plan = tuple((param_name, None if pos is None else pos - 1, local)
+                     for param_name, pos, local in plan)
+    return plan
+
+
+def _call_stealing(clb, plan, frame, a, kwa):
+    """Call clb, passing the missing arguments stolen from frame."""
+    return clb(*a, **_stolen_kwargs(plan, frame, a, kwa))
+
+
+def _stolen_kwargs(plan, frame, a, kwa):
+    """Return kwa extended with the arguments stolen from frame."""
+    kwa = dict(kwa)
+    caller_locals = None
+    for param_name, position, local_name in plan:
+        if param_name in kwa or (position is not None and position < len(a)):
+            continue  # provided by someone else
+        if local_name is None:
+            kwa[param_name] = _frameinfo(frame)
+            continue
+        if caller_locals is None:
+            caller_locals = frame.f_locals
+        try:
+            kwa[param_name] = caller_locals[local_name]
+        except KeyError as ke:
+            avail = ', '.join('\'' + k + '\'' for k in caller_locals.keys())
+            text = ke.args[0] + ' (available: ' + avail + ')'
+            raise NameError(text)
+    return kwa
+
+
 class _Steal:
     def __init__(self, name=None):
         self._name = name
@@ -269,6 +1041,130 @@ class _StealFrameInfo:
 steal_frameinfo = _StealFrameInfo()
 
 
+########################################
+# Parallel dispatch, threads and pools #
+########################################
+
+_executors = {}  # {plugging point name: executor}, see set_executor
+
+
+def set_executor(name, executor):
+    """
+    Make hacks.call.<name>() run the hooks on a concurrent.futures executor,
+    waiting for all of them and returning the results in the usual order.
+    Hooks see the same active registry in the workers; stealing hooks get
+    their arguments from the caller before any of them starts.
+    Process pools get the registry pickled, with the hacks it uses.
+    Pass executor=None to go back to calling them one after another.
+    """
+    if executor is None:
+        _executors.pop(name, None)
+    else:
+        _executors[name] = executor
+    for registry in list(_registries):  # recompile dispatchers
+        registry._dispatchers.pop(name, None)
+
+
+class _ParallelCallProxy():
+    """A class allowing hacks.call_on(executor).some_func()."""
+    def __init__(self, executor, registry=None):
+        self._executor = executor
+        self._registry = registry
+
+    def __getattr__(self, name):
+        registry = self._registry or _lookup()
+        if not registry:
+            return _call_nothing
+        entries, executor = registry._entries[name], self._executor
+        def fan_out(frame, a, kwa):
+            return _fan_out(registry, entries, executor, frame, a, kwa)
+        if _stats is not None:
+            return _stats._parallel_dispatcher(name, len(entries), fan_out)
+
+        def parallel_dispatch(*a, **kwa):
+            return fan_out(sys._getframe(1), a, kwa)
+        return parallel_dispatch
+
+
+def call_on(executor):
+    """
+    Return a hacks.call variant running the hooks on an executor,
+    like hacks.set_executor does for all calls of a plugging point.
+    """
+    return _ParallelCallProxy(executor)
+
+
+def _fan_out(registry, entries, executor, frame, a, kwa):
+    # Steal in the caller's frame, the workers won't have it
+    calls = [(clb, _stolen_kwargs(plan, frame, a, kwa) if plan else kwa)
+             for clb, plan, _ in entries]
+    futures = [executor.submit(_call_in_registry, registry, clb, a, clb_kwa)
+               for clb, clb_kwa in calls]
+    try:
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:  # the rest of them, if one has failed
+            future.cancel()
+
+
+def _call_in_registry(registry, func, a, kwa):
+    """Call func with the registry active, e.g. in a worker thread."""
+    frame = sys._getframe()
+    registry._push(frame)
+    try:
+        return func(*a, **kwa)
+    finally:
+        registry._pop(frame)
+
+
+class _RegistryTask:
+    """A callable calling func with a registry active, see wrap_task."""
+    def __init__(self, func, registry):
+        self._func, self._registry = func, registry
+
+    def __call__(self, *a, **kwa):
+        if self._registry is not None:
+            return _call_in_registry(self._registry, self._func, a, kwa)
+        # None was active, unlike in processes forked inside 'with'
+        token = _active_registries.set((None, ()))
+        try:
+            return self._func(*a, **kwa)
+        finally:
+            _active_registries.reset(token)
+
+
+def wrap_task(func):
+    """
+    Capture the active registry, return a callable calling func with it
+    active wherever it runs, e.g. in a threading.Thread target
+    or in a task submitted to an executor.
+    Pickles along with the registry if func does, e.g. for process pools.
+    """
+    return _RegistryTask(func, _lookup())
+
+
+class Executor(concurrent.futures.Executor):
+    """
+    Wrap a concurrent.futures executor (a thread or a process pool),
+    so that the tasks see the registry active when they're submitted:
+
+        with hacks.Executor(ThreadPoolExecutor()) as pool:
+            with hacks.use(...):
+                pool.map(hacked_code, items)
+    """
+    def __init__(self, executor):
+        self._executor = executor
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(wrap_task(fn), *args, **kwargs)
+
+    def map(self, fn, *iterables, **kwargs):
+        return self._executor.map(wrap_task(fn), *iterables, **kwargs)
+
+    def shutdown(self, *args, **kwargs):
+        return self._executor.shutdown(*args, **kwargs)
+
+
 #####################################
 # @hacks.friendly and @hacks.around #
 #####################################
@@ -288,19 +1184,56 @@ def around(*names_to_hack_around):
     return around_decorator
 
 
+class _WrapperCache(weakref.WeakKeyDictionary):
+    """
+    Objects wrapped for each registry by a friendly object or class.
+    Registries are referenced weakly, their entries vanish along with them.
+    """
+    def __init__(self, kind, names):
+        super().__init__()
+        self.kind, self.names = kind, names
+        _wrapper_caches.add(self)
+
+    # Each cache is distinct, whatever it holds
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+
+_wrapper_caches = weakref.WeakSet()
+_MISSING = object()
+
+WrapperCacheInfo = collections.namedtuple('WrapperCacheInfo',
+                                          'kind names size')
+
+
+def wrapper_cache_info():
+    """
+    Describe the caches of all living @hacks.friendly objects
+    and @hacks.friendly_class classes, as a list of WrapperCacheInfo
+    (kind, names, number of registries having a wrapped version cached).
+    """
+    return [WrapperCacheInfo(cache.kind, cache.names, len(cache))
+            for cache in list(_wrapper_caches)]
+
+
+def clear_wrapper_caches():
+    """Forget everything wrapped by friendly objects and classes."""
+    for cache in list(_wrapper_caches):
+        cache.clear()
+
+
 def _cached_effective_wrapped_object(cache, original_object,
-                                     names_for_hacks_around):
-    # Possibly a hot function, TODO: optimize
-    registry = get_recent_plugins_registry()
+                                     names_for_hacks_around, registry=None):
+    registry = registry or _lookup()
     if not registry:
         return original_object
-    if registry in cache.keys(): # Reuse an object pre-wrapped with hacks
-        return cache[registry]
-    else: # Wrap an object for use with current registry and cache it
+    wrapped = cache.get(registry, _MISSING)  # Reuse a pre-wrapped object
+    if wrapped is _MISSING:  # or wrap it for use with current registry
         wrapped = registry._apply_hacks_around(original_object,
-                                               names_for_hacks_around)
+                                               names_for_hacks_around, cache)
         cache[registry] = wrapped
-        return wrapped
+        registry._wrapper_caches.add(cache)
+    return wrapped
 
 
 def friendly(*names_for_hacks_around):
@@ -336,7 +1269,7 @@ def friendly(*names_for_hacks_around):
             return friendly(name)(arg)
 
     def friendly_decorator(original_object):
-        cache = {}
+        cache = _WrapperCache('friendly', names_for_hacks_around)
         def rewrap_object():
             return _cached_effective_wrapped_object(cache, original_object,
                                                     names_for_hacks_around)
@@ -364,6 +1297,7 @@ def before(*names_to_hack_before):
                 return original_func(*a, **kwa)
             return before_aware_func
 
+        hacking_around.__hacks_profile_target__ = func_to_call_before
         return hacking_around
     return before_decorator
 
@@ -385,6 +1319,7 @@ def after(*names_to_hack_after):
                 return retval
             return after_aware_func
 
+        hacking_after.__hacks_profile_target__ = func_to_call_after
         return hacking_after
     return after_decorator
 
@@ -405,17 +1340,25 @@ def up(*names_to_hack_up):
     return up_decorator
 
 
-def _cached_effective_wrapped_up_class(cache, original_cls, names_for_hacks_up):
-    # Possibly a hot function, TODO: optimize
-    registry = get_recent_plugins_registry()
+def _cached_effective_wrapped_up_class(cache, original_cls, names_for_hacks_up,
+                                       registry=None):
+    registry = registry or _lookup()
     if not registry:
         return original_cls
-    if registry in cache.keys(): # Reuse an class pre-wrapped with hack-ups
-        return cache[registry]
-    else: # Wrap an object for use with current registry and cache it
-        wrapped = registry._apply_hacks_up(original_cls, names_for_hacks_up)
+    wrapped = cache.get(registry)  # Reuse a class pre-wrapped with hack-ups
+    if wrapped is None:  # or wrap it for use with current registry
+        wrapped = registry._apply_hacks_up(original_cls, names_for_hacks_up,
+                                           cache)
         cache[registry] = wrapped
-        return wrapped
+        registry._wrapper_caches.add(cache)
+    return wrapped
+
+
+# Objects wrapped into ClassHopperMutants, for hacks.introspect()
+# (the mutants themselves can't be referenced weakly,
+# neither can instances of some classes, e.g. of tuple subclasses)
+_class_hopping = weakref.WeakValueDictionary()
+_class_hopping_ids = itertools.count()
 
 
 def friendly_class(*names_for_hacks_up):
@@ -443,7 +1386,7 @@ def friendly_class(*names_for_hacks_up):
             return friendly_class(name)(arg)
 
     def friendly_class_decorator(original_cls):
-        cache = {}
+        cache = _WrapperCache('friendly_class', names_for_hacks_up)
 
         def reclassify(_):
             return _cached_effective_wrapped_up_class(cache, original_cls,
@@ -452,7 +1395,14 @@ def friendly_class(*names_for_hacks_up):
         class MetaAutoreparenting(type):
             def __call__(cls, *args, **kwds):
                 original_object = type.__call__(cls, *args, **kwds)
-                return mutants.ClassHopperMutant(original_object, reclassify)
+                # Copied like ClassHopperMutant does, but here, to track it
+                hopping_object = copy.copy(original_object)
+                try:
+                    _class_hopping[next(_class_hopping_ids)] = hopping_object
+                except TypeError:
+                    pass  # can't be referenced weakly, won't be counted
+                return mutants.ClassHopperMutant(hopping_object, reclassify,
+                                                 copy=False)
 
         class AutoReparenting(original_cls, metaclass=MetaAutoreparenting):
             pass
@@ -473,4 +1423,518 @@ def on_top_of(*names_to_hack_on_top_of):
     return on_top_of_decorator
 
 
+#################
+# hacks.stats() #
+#################
+
+_STATS_SAMPLES = 10000  # latencies kept per hook for the percentiles
+
+StatsReport = collections.namedtuple('StatsReport', 'points caches')
+PointStats = collections.namedtuple('PointStats',
+                                    'name calls hooks time hook_stats')
+HookStats = collections.namedtuple('HookStats',
+                                   'hook calls time p50 p90 p99 steal_time')
+CacheStats = collections.namedtuple('CacheStats',
+                                    'kind names hits misses rewraps')
+
+
+def _hook_name(clb):
+    return (getattr(clb, '__module__', None) or '?') + '.' + \
+        getattr(clb, '__qualname__', repr(clb))
+
+
+def _percentile(ordered, q):
+    return ordered[int(q * (len(ordered) - 1))] if ordered else 0.0
+
+
+class _PointCounter:
+    def __init__(self):
+        self.calls, self.hooks, self.time = 0, 0, 0.0
+        # {hook function: _HookCounter}, by function rather than by name,
+        # as unrelated hooks can be named the same
+        self.hook_counters = {}
+
+
+class _HookCounter:
+    def __init__(self, name):
+        self.name = name
+        self.calls, self.time, self.steal_time = 0, 0.0, 0.0
+        self.samples = collections.deque(maxlen=_STATS_SAMPLES)
+
+
+class _CacheCounter:
+    def __init__(self):
+        self.hits, self.misses, self.rewraps = 0, 0, 0
+        self.registries = weakref.WeakSet()  # wrapped for at least once
+
+
+class _StatsCollector:
+    """What hacks.stats() reports, gathered while enabled."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._points = {}  # {plugging point name: _PointCounter}
+        self._caches = weakref.WeakKeyDictionary()  # {cache: _CacheCounter}
+
+    def _point(self, name):
+        with self._lock:
+            return self._points.setdefault(name, _PointCounter())
+
+    def _hook_counter(self, point, clb):
+        hook = getattr(clb, '__func__', clb)  # the same for all instances
+        counter = point.hook_counters.get(hook)
+        if counter is None:
+            counter = point.hook_counters[hook] = _HookCounter(_hook_name(clb))
+        return counter
+
+    def _record(self, point, hooks, elapsed, hook_records=()):
+        """
+        Add up a dispatch and the (counter, calls, time, steal time)
+        of its hooks, gathered without the lock, as they may run in parallel.
+        """
+        with self._lock:
+            point.calls += 1
+            point.hooks = hooks
+            point.time += elapsed
+            for counter, calls, spent, steal_time in hook_records:
+                self._record_hook(counter, calls, spent, steal_time)
+
+    def _record_hook(self, counter, calls, spent, steal_time=0.0):
+        """Add up a hook call, with the lock held."""
+        counter.calls += calls
+        counter.time += spent
+        counter.steal_time += steal_time
+        counter.samples.append(spent)
+
+    def _dispatcher(self, name, callables):
+        """Like _PluginRegistry._compile_dispatcher, but timing everything."""
+        point = self._point(name)
+        with self._lock:
+            entries = tuple((clb, _bound_steal_plan(clb),
+                             self._hook_counter(point, clb))
+                            for clb in callables)
+        perf_counter = time.perf_counter
+
+        def counting_dispatch(*a, **kwa):
+            frame = sys._getframe(1)
+            started = perf_counter()
+            results, hook_records = [], []
+            for clb, plan, counter in entries:
+                stealing_started = perf_counter()
+                if plan:
+                    clb_kwa = _stolen_kwargs(plan, frame, a, kwa)
+                    clb_started = perf_counter()
+                    results.append(clb(*a, **clb_kwa))
+                else:
+                    clb_started = stealing_started
+                    results.append(clb(*a, **kwa))
+                hook_records.append((counter, 1,
+                                     perf_counter() - clb_started,
+                                     clb_started - stealing_started))
+            self._record(point, len(entries), perf_counter() - started,
+                         hook_records)
+            return results
+        return counting_dispatch
+
+    def _parallel_dispatcher(self, name, hooks, fan_out):
+        """Like _dispatcher, for hooks run on an executor, timing the point."""
+        point = self._point(name)
+        perf_counter = time.perf_counter
+
+        def counting_parallel_dispatch(*a, **kwa):
+            started = perf_counter()
+            results = fan_out(sys._getframe(1), a, kwa)
+            self._record(point, hooks, perf_counter() - started)
+            return results
+        return counting_parallel_dispatch
+
+    def _counted(self, name, clb, batch_form=None):
+        """
+        Wrap a hook (or its batch form) to time its calls,
+        for the variants of hacks.call that don't call hooks themselves.
+        """
+        point = self._point(name)
+        with self._lock:
+            counter = self._hook_counter(point, clb)
+        if batch_form is not None:
+            return _CountedHook(batch_form, counter, self, batch=True)
+        return _CountedHook(clb, counter, self)
+
+    def _iterator(self, name, hooks, iterate):
+        """Like _dispatcher, for _PluginRegistry._compile_iterator."""
+        def counting_iterate(frame, a, kwa):
+            return self._counting(name, hooks, iterate(frame, a, kwa))
+        return counting_iterate
+
+    def _counting(self, name, hooks, results):
+        """
+        Yield from an iterator over dispatch results,
+        timing what it takes to produce them, but not what the caller does.
+        """
+        point, perf_counter, spent = self._point(name), time.perf_counter, 0.0
+        try:
+            while True:
+                started = perf_counter()
+                try:
+                    result = next(results)
+                except StopIteration:
+                    return
+                finally:
+                    spent += perf_counter() - started
+                yield result
+        finally:
+            self._record(point, hooks, spent)
+
+    async def _counting_awaitable(self, name, hooks, awaitable):
+        """Await a dispatch, timing it, see hacks.acall."""
+        point, started = self._point(name), time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self._record(point, hooks, time.perf_counter() - started)
+
+    def _count_cache_access(self, cache, registry):
+        with self._lock:
+            counter = self._caches.get(cache)
+            if counter is None:
+                counter = self._caches[cache] = _CacheCounter()
+            if registry in cache:
+                counter.hits += 1
+            elif registry not in counter.registries:
+                counter.misses += 1  # wrapping for this registry first time
+                counter.registries.add(registry)
+            else:
+                counter.rewraps += 1  # wrapping for it again
+
+    def report(self):
+        with self._lock:
+            points = [PointStats(
+                name, point.calls, point.hooks, point.time,
+                [HookStats(c.name, c.calls, c.time,
+                           *(_percentile(sorted(c.samples), q)
+                             for q in (.5, .9, .99)),
+                           c.steal_time)
+                 for c in point.hook_counters.values()])
+                for name, point in self._points.items()]
+            caches = [CacheStats(cache.kind, cache.names,
+                                 c.hits, c.misses, c.rewraps)
+                      for cache, c in self._caches.items()]
+        return StatsReport(points, caches)
+
+
+class _CountedHook:
+    """
+    A hook timed by _StatsCollector, awaiting what it returns if awaitable.
+    Pickled as just the hook, e.g. for a process pool, not counted there.
+    """
+    def __init__(self, hook, counter, collector, batch=False):
+        self._hook, self._counter, self._collector = hook, counter, collector
+        self._batch = batch  # a batch form, counted once per argument set
+
+    def __call__(self, *a, **kwa):
+        started = time.perf_counter()
+        result = self._hook(*a, **kwa)
+        if inspect.isawaitable(result):
+            return self._awaiting(result, started, a)
+        self._count(started, a)
+        return result
+
+    async def _awaiting(self, awaitable, started, a):
+        try:
+            return await awaitable
+        finally:
+            self._count(started, a)
+
+    def _count(self, started, a):
+        spent = time.perf_counter() - started
+        calls = len(a[0]) if self._batch and a else 1
+        with self._collector._lock:
+            self._collector._record_hook(self._counter, calls, spent)
+
+    def __reduce__(self):
+        return _uncounted, (self._hook,)
+
+
+def _uncounted(hook):
+    return hook
+
+
+def _counting_cache_access(cached_effective, collector):
+    """Wrap a _cached_effective_* function to count cache hits and misses."""
+    def counting(cache, original, names, registry=None):
+        registry = registry or _lookup()
+        if registry:
+            collector._count_cache_access(cache, registry)
+        return cached_effective(cache, original, names, registry)
+    counting.__wrapped__ = cached_effective
+    return counting
+
+
+_stats = None  # the collector, only while enabled
+_stats_collected = _StatsCollector()
+
+
+def enable_stats(enabled=True):
+    """
+    Start (or stop, with enabled=False) gathering the data hacks.stats()
+    reports. Disabled by default, costing nothing then:
+    the dispatchers and caches are swapped for counting ones while enabled.
+    """
+    global _stats, _cached_effective_wrapped_object
+    global _cached_effective_wrapped_up_class
+    if enabled == (_stats is not None):
+        return
+    if enabled:
+        _stats = _stats_collected
+        _cached_effective_wrapped_object = _counting_cache_access(
+            _cached_effective_wrapped_object, _stats)
+        _cached_effective_wrapped_up_class = _counting_cache_access(
+            _cached_effective_wrapped_up_class, _stats)
+    else:
+        _cached_effective_wrapped_object = \
+            _cached_effective_wrapped_object.__wrapped__
+        _cached_effective_wrapped_up_class = \
+            _cached_effective_wrapped_up_class.__wrapped__
+        _stats = None
+    for registry in list(_registries):  # recompile dispatchers
+        registry._dispatchers.clear()
+        registry._iterators.clear()
+        registry._entries.clear()
+
+
+def disable_stats():
+    """Stop gathering stats, keeping what's gathered for hacks.stats()."""
+    enable_stats(False)
+
+
+def stats(reset=False):
+    """
+    Report what's been gathered since hacks.enable_stats() as a StatsReport:
+    points: a PointStats per plugging point called through hacks.call
+        or its variants with an active registry: calls, hooks (number of),
+        time (seconds spent dispatching, e.g. awaiting hacks.acall,
+        but not what the caller does between hacks.call_iter results)
+        and hook_stats, a HookStats for each hook: calls, time, latency
+        percentiles (of the last calls) and time spent stealing arguments
+        (by hacks.call only); hooks run in other processes aren't counted;
+    caches: a CacheStats per friendly object or class:
+        hits, misses (first wraps for a registry) and rewraps (wrapping
+        again for a registry, after its wrappers got released or cleared).
+    """
+    global _stats_collected
+    report = _stats_collected.report()
+    if reset:
+        _stats_collected = _StatsCollector()
+        if _stats is not None:
+            disable_stats()
+            enable_stats()
+    return report
+
+
+###################
+# hacks.profile() #
+###################
+
+LayerStats = collections.namedtuple('LayerStats', 'layer calls time')
+
+# Class attributes not to be wrapped by _Profiler._class_layer
+_UNPROFILED_METHODS = ('__init_subclass__', '__new__', '__class_getitem__',
+                       '__getattribute__', '__getattr__')
+
+
+class _Profiler:
+    """
+    Times the layers built by @hacks.around, @hacks.before, @hacks.after
+    and @hacks.up hacks, see hacks.profile().
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()  # .stack: [[label, child time]]
+        self._layers = {}  # {label: [calls, exclusive time]}
+        self._paths = {}  # {(outermost label, ..., label): exclusive time}
+
+    def _layer(self, layer, hack, label=None):
+        """Wrap a function built by a hack to time it."""
+        if not inspect.isroutine(layer):
+            return layer  # no idea how to time calls of that
+        if label is None:
+            # @hacks.before/@hacks.after hacks are labelled by what they call
+            label = _hook_name(getattr(hack, '__hacks_profile_target__', hack))
+        local, perf_counter = self._local, time.perf_counter
+
+        @functools.wraps(layer)  # look the same, __name__, attributes and all
+        def profiled_layer(*a, **kwa):
+            stack = getattr(local, 'stack', None)
+            if stack is None:
+                stack = local.stack = []
+            stack.append([label, 0.0])
+            started = perf_counter()
+            try:
+                return layer(*a, **kwa)
+            finally:
+                elapsed = perf_counter() - started
+                path = tuple(entry[0] for entry in stack)
+                _, children = stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                self._record(path, elapsed - children)
+        return profiled_layer
+
+    def _class_layer(self, cls, hack):
+        """Derive from a class built by a hack to time its methods."""
+        prefix = _hook_name(hack) + ':'
+        namespace = {name: self._layer(attr, hack, prefix + name)
+                     for name, attr in vars(cls).items()
+                     if inspect.isfunction(attr)
+                     and name not in _UNPROFILED_METHODS}
+        if not namespace:
+            return cls
+        namespace.update(__slots__=(),  # keep the layout for class hopping
+                         __module__=cls.__module__,
+                         __qualname__=cls.__qualname__)
+        return type(cls)(cls.__name__, (cls,), namespace)
+
+    def _record(self, path, exclusive):
+        with self._lock:
+            counts = self._layers.setdefault(path[-1], [0, 0.0])
+            counts[0] += 1
+            counts[1] += exclusive
+            self._paths[path] = self._paths.get(path, 0.0) + exclusive
+
+    def layers(self):
+        """Return a LayerStats (layer, calls, exclusive time) per layer."""
+        with self._lock:
+            return [LayerStats(label, calls, spent)
+                    for label, (calls, spent) in self._layers.items()]
+
+    def collapsed(self):
+        """
+        Return the layers' exclusive times in microseconds
+        as collapsed stacks, the input format of flame graph tools.
+        """
+        with self._lock:
+            return ''.join(';'.join(path) + ' %d\n' % round(spent * 1e6)
+                           for path, spent in self._paths.items())
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+
+
+_profiler = None
+
+
+@contextlib.contextmanager
+def profile():
+    """
+    A context manager timing the layers that @hacks.around, @hacks.before,
+    @hacks.after and @hacks.up hacks add to friendly objects and classes,
+    each attributed to the hack that has built it:
+
+        with hacks.profile() as profiler:
+            main_code()
+        print(profiler.layers())
+        profiler.write_collapsed('hacks.folded')  # for flamegraph.pl
+
+    The time is exclusive: whatever the next layer takes is not included.
+    Profiling is process-wide: the wrapper caches of all friendly objects
+    and classes get cleared on entering and leaving, for every registry
+    in every thread, so that everything gets wrapped again,
+    with or without timing.
+    """
+    global _profiler
+    previous, _profiler = _profiler, _Profiler()
+    clear_wrapper_caches()
+    try:
+        yield _profiler
+    finally:
+        _profiler = previous
+        clear_wrapper_caches()
+
+
+######################
+# hacks.introspect() #
+######################
+
+LiveState = collections.namedtuple(
+    'LiveState', 'registries wrapper_caches class_hoppers marked_frames')
+RegistryInfo = collections.namedtuple(
+    'RegistryInfo', 'registry parent interned hacks wrapper_caches up_classes')
+MarkedFrame = collections.namedtuple(
+    'MarkedFrame', 'thread filename lineno function registries')
+
+
+def _marked_frame(thread, frame):
+    registries = frame.f_locals.get(LOCALS_MARKER)
+    if registries:
+        return MarkedFrame(thread, frame.f_code.co_filename, frame.f_lineno,
+                           frame.f_code.co_name, list(registries))
+
+
+def _marked_frames_alive():
+    """Frames with LOCALS_MARKER in the threads' stacks and in generators."""
+    found = []
+    for thread, frame in sys._current_frames().items():
+        while frame is not None:
+            found.append(_marked_frame(thread, frame))
+            frame = frame.f_back
+    for obj in gc.get_objects():  # suspended generators and coroutines
+        # type(), as isinstance() would make friendly objects wrap themselves
+        obj_type = type(obj)
+        if obj_type is types.GeneratorType:
+            frame, running = obj.gi_frame, obj.gi_running
+        elif obj_type is types.CoroutineType:
+            frame, running = obj.cr_frame, obj.cr_running
+        elif obj_type is types.AsyncGeneratorType:
+            frame, running = obj.ag_frame, obj.ag_running
+        else:
+            continue
+        if frame is not None and not running:
+            found.append(_marked_frame(None, frame))
+    return [marked for marked in found if marked is not None]
+
+
+def introspect():
+    """
+    Report what hacks keeps alive as a LiveState:
+    registries: a RegistryInfo per registry alive:
+        its parent, whether it's interned, its own hacks (number of),
+        the wrapper caches holding objects wrapped for it (number of)
+        and the classes @hacks.up hacks have built for it;
+    wrapper_caches: the sizes of the caches, see hacks.wrapper_cache_info();
+    class_hoppers: the number of @hacks.friendly_class instances alive
+        (of those that can be referenced weakly);
+    marked_frames: a MarkedFrame (thread ident or None if suspended,
+        filename, lineno, function, registries) per frame
+        still marked with LOCALS_MARKER by 'with hacks.use(...)'.
+    Walks the objects tracked by the garbage collector, so it's slow.
+    """
+    # First, as it refreshes the frames' f_locals, releasing deleted locals
+    marked_frames = _marked_frames_alive()
+    up_classes = collections.defaultdict(list)
+    for cache in list(_wrapper_caches):
+        if cache.kind == 'friendly_class':
+            for registry, cls in list(cache.items()):
+                up_classes[registry].append(cls)
+    registries = [RegistryInfo(registry, registry._parent, registry._interned,
+                               len(registry._new_hacks_list),
+                               len(registry._wrapper_caches),
+                               up_classes.get(registry, []))
+                  for registry in list(_registries)]
+    return LiveState(registries, wrapper_cache_info(), len(_class_hopping),
+                     marked_frames)
+
+
+#########################
+# Plugins autodiscovery #
+#########################
+
+def use_discovered(*a, **kwa):
+    """
+    hacks.use(...) the plugins advertised through setuptools entry points,
+    see hacks.discovery.use_discovered.
+    """
+    from hacks import discovery
+    return discovery.use_discovered(*a, **kwa)
+
+
 # TODO: rewrite into a single class with exported @classmethods
@@ -0,0 +1,243 @@
+# Copyright (c) 2016 Alexander Sosedkin <monk@unboiled.info>
+# Distributed under the terms of the MIT License, see below:
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Plugins autodiscovery through setuptools entry points.
+
+Distributions advertise their hacks in an entry point group:
+
+    [options.entry_points]
+    hacks.plugins =
+        greeter = my_plugins.greet:Greeter
+
+and hacks.use_discovered() activates them.
+Reading the entry points of all the installed distributions is slow,
+so the findings are kept in a discovery index file, which is only rebuilt
+when the metadata of the installed distributions changes.
+The plugin modules are scanned with hacks.index instead of being imported,
+so the plugins are lazy wherever that is possible.
+"""
+
+
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import sys
+import threading
+
+import hacks
+import hacks.index
+
+
+DEFAULT_GROUP = 'hacks.plugins'
+INDEX_VERSION = 1
+
+
+def default_index_path():
+    """$HACKS_DISCOVERY_INDEX or hacks/discovery.json in the user cache dir."""
+    if os.environ.get('HACKS_DISCOVERY_INDEX'):
+        return os.environ['HACKS_DISCOVERY_INDEX']
+    cache_dir = (os.environ.get('XDG_CACHE_HOME') or
+                 os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_dir, 'hacks', 'discovery.json')
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _fingerprint():
+    """
+    Cheaply identify the installed distributions:
+    paths and mtimes of their metadata dirs and entry_points.txt files.
+    """
+    fingerprint = []
+    for entry in sys.path:
+        entry = entry or '.'
+        try:
+            names = sorted(os.listdir(entry))
+        except OSError:
+            continue
+        for name in names:
+            if name.endswith(('.dist-info', '.egg-info')):
+                path = os.path.join(os.path.abspath(entry), name)
+                fingerprint.append([path, _mtime(path),
+                                    _mtime(os.path.join(path,
+                                                        'entry_points.txt'))])
+    return fingerprint
+
+
+#######################################
+# Scanning the installed entry points #
+#######################################
+
+def _module_source(dist, module_name):
+    """Find the source file of a module in a distribution, not importing it."""
+    parts = module_name.split('.')
+    candidates = ('/'.join(parts) + '.py', '/'.join(parts) + '/__init__.py')
+    for f in dist.files or ():
+        if str(f).replace(os.sep, '/') in candidates:
+            return str(dist.locate_file(f))
+    if len(parts) == 1:  # e.g. an editable install; doesn't import anything
+        spec = importlib.util.find_spec(module_name)
+        if spec and spec.origin and spec.origin.endswith('.py'):
+            return spec.origin
+
+
+def _describe(dist, entry_point):
+    """Describe what an entry point offers, as stored in the index."""
+    value = entry_point.value.split('[')[0].strip()  # drop extras
+    entry = {'name': entry_point.name, 'value': value,
+             'dist': dist.metadata['Name'], 'version': dist.version,
+             'into': [], 'around': [], 'up': [], 'eager': True}
+    if ':' not in value:
+        return entry  # a whole module
+    module_name = value.split(':')[0]
+    path = _module_source(dist, module_name)
+    if path is None:
+        return entry
+    try:
+        with open(path, 'rb') as f:
+            plugins = hacks.index._scan_module(module_name, f.read())
+    except (OSError, SyntaxError):
+        return entry
+    for plugin in plugins:
+        if plugin['ref'] == value:
+            entry.update((k, plugin[k]) for k in ('into', 'around', 'up',
+                                                  'eager'))
+    return entry
+
+
+def _scan(group):
+    entries, seen_dists = [], set()
+    for dist in importlib.metadata.distributions():
+        dist_name = dist.metadata['Name']
+        if dist_name in seen_dists:  # shadowed by an earlier sys.path entry
+            continue
+        seen_dists.add(dist_name)
+        for entry_point in dist.entry_points:
+            if entry_point.group == group:
+                entries.append(_describe(dist, entry_point))
+    return entries
+
+
+############################
+# The discovery index file #
+############################
+
+# In-process results, so that the same hacks objects are returned and
+# hacks.use can reuse the registries: {(index path, group): [(entry, hack)]}
+_discovered = {}
+_discovered_lock = threading.Lock()
+
+
+def _read_index(path):
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get('version') == INDEX_VERSION else None
+
+
+def _write_index(path, index):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # no cache then
+
+
+def discover(group=DEFAULT_GROUP, index_path=None, refresh=False):
+    """
+    Return the descriptions of the plugins advertised in an entry point group
+    (dicts with name, value, dist, version, into, around, up and eager keys).
+    Entry points are only read if the discovery index at index_path
+    doesn't have them for the installed distributions yet.
+    """
+    index_path = index_path or default_index_path()
+    fingerprint = _fingerprint()
+    index = None if refresh else _read_index(index_path)
+    if index is None or index['fingerprint'] != fingerprint:
+        index = {'version': INDEX_VERSION, 'fingerprint': fingerprint,
+                 'groups': {}}
+    if group not in index['groups']:
+        index['groups'][group] = _scan(group)
+        _write_index(index_path, index)
+    return index['groups'][group]
+
+
+def _to_hack(entry):
+    if not entry['eager']:
+        return hacks.lazy(entry['value'], into=entry['into'],
+                          around=entry['around'], up=entry['up'])
+    if ':' in entry['value']:
+        return entry['value']  # imported by hacks.use
+    return importlib.import_module(entry['value'])
+
+
+def discovered(group=DEFAULT_GROUP, names=None, exclude=(), select=None,
+               index_path=None, refresh=False):
+    """
+    Return hacks advertised in an entry point group, ready for hacks.use,
+    lazy wherever possible. Only those with entry point names in names
+    (if given), not in exclude and satisfying select(description) are kept.
+    Within a process, the installed distributions are examined only once
+    (unless refresh=True).
+    """
+    index_path = index_path or default_index_path()
+    key = (index_path, group)
+    with _discovered_lock:
+        found = None if refresh else _discovered.get(key)
+    if found is None:
+        entries = discover(group, index_path=index_path, refresh=refresh)
+        found = [(entry, None) for entry in entries]
+        with _discovered_lock:
+            _discovered[key] = found
+    selected = []
+    for i, (entry, hack) in enumerate(found):
+        if names is not None and entry['name'] not in names:
+            continue
+        if entry['name'] in exclude or (select and not select(entry)):
+            continue
+        if hack is None:
+            hack = _to_hack(entry)
+            found[i] = entry, hack
+        selected.append(hack)
+    return selected
+
+
+def use_discovered(group=DEFAULT_GROUP, names=None, exclude=(), select=None,
+                   only=False, index_path=None, refresh=False):
+    """hacks.use(...) the plugins discovered(...) in an entry point group."""
+    return hacks.use(*discovered(group, names=names, exclude=exclude,
+                                 select=select, index_path=index_path,
+                                 refresh=refresh),
+                     only=only)
@@ -0,0 +1,352 @@
+# Copyright (c) 2016 Alexander Sosedkin <monk@unboiled.info>
+# Distributed under the terms of the MIT License, see below:
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+An offline index of hacks, for starting up fast with many optional plugins.
+
+Scans the sources of packages for @hacks.into, @hacks.around (and its
+@hacks.before/@hacks.after forms), @hacks.up, @hacks.on_top_of
+and @hacks.stateful without importing them and writes a manifest,
+mapping plugging point names to 'module:qualname' references
+of top-level functions and classes:
+
+    python -m hacks.index -o hacks-index.json my_plugins other.plugins
+
+Then hacks.use(*hacks.index.load('hacks-index.json')) registers the plugins
+without importing them; each gets imported once something it hooks is needed.
+Plugins with @hacks.on_top_of, @hacks.stateful, __on_enter__/__on_exit__
+or names that are not string literals are imported right away instead.
+The manifest gets rebuilt when the scanned sources change.
+
+Classes inherit the declarations of the classes they derive from
+in the same module. Those serving as bases there, abstract ones
+and the ones left out of a literal __all__ aren't plugins themselves.
+Classes with bases from elsewhere are imported right away,
+to find out what they inherit, but a class declaring no hacks itself
+and only inheriting them from another module is missed.
+"""
+
+
+import argparse
+import ast
+import importlib.util
+import json
+import os
+import threading
+
+import hacks
+
+
+MANIFEST_VERSION = 1
+
+# Decorators to look for and the tables they put hacks into
+_DECLARATIONS = {
+    'into': 'into',
+    'around': 'around', 'before': 'around', 'after': 'around',
+    'up': 'up',
+    'on_top_of': None,
+    'stateful': None,  # to be known before hacks.use interns the registry
+}
+_KINDS = ('into', 'around', 'up')
+
+
+############
+# Scanning #
+############
+
+def _package_roots(package):
+    """Locate a package directory or a module file without importing it."""
+    spec = importlib.util.find_spec(package)
+    if spec is None:
+        raise ImportError('No module named ' + repr(package))
+    if spec.submodule_search_locations:
+        return [os.path.abspath(p) for p in spec.submodule_search_locations]
+    return [os.path.abspath(spec.origin)]
+
+
+def _walk_sources(package, root, sources):
+    """Yield module names and paths, record mtimes of files and dirs seen."""
+    sources[root] = os.stat(root).st_mtime_ns
+    if not os.path.isdir(root):
+        yield package, root
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames
+                             if os.path.exists(os.path.join(dirpath, d,
+                                                            '__init__.py')))
+        sources[dirpath] = os.stat(dirpath).st_mtime_ns
+        for filename in sorted(filenames):
+            if not filename.endswith('.py'):
+                continue
+            path = os.path.join(dirpath, filename)
+            sources[path] = os.stat(path).st_mtime_ns
+            parts = os.path.relpath(path, root)[:-3].split(os.sep)
+            if parts[-1] == '__init__':
+                parts = parts[:-1]
+            yield '.'.join([package] + parts), path
+
+
+def _hacks_aliases(tree):
+    """Find out how the module refers to hacks and its decorators."""
+    module_names, decorator_names = set(), {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == 'hacks':
+                    module_names.add(alias.asname or alias.name)
+        elif (isinstance(node, ast.ImportFrom) and node.module == 'hacks' and
+              not node.level):
+            for alias in node.names:
+                decorator_names[alias.asname or alias.name] = alias.name
+    return module_names, decorator_names
+
+
+def _declaration(decorator, module_names, decorator_names):
+    """Return (decorator name, names passed or None) for hacks decorators."""
+    call = decorator if isinstance(decorator, ast.Call) else None
+    func = call.func if call else decorator
+    if (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+            and func.value.id in module_names):
+        decorator_name = func.attr
+    elif isinstance(func, ast.Name) and func.id in decorator_names:
+        decorator_name = decorator_names[func.id]
+    else:
+        return None
+    if decorator_name not in _DECLARATIONS:
+        return None
+    if (call and not call.keywords and
+            all(isinstance(arg, ast.Constant) and isinstance(arg.value, str)
+                for arg in call.args)):
+        return decorator_name, [arg.value for arg in call.args]
+    return decorator_name, None
+
+
+def _definitions(node):
+    """Yield a top-level definition and everything defined in its classes."""
+    yield node
+    if isinstance(node, ast.ClassDef):
+        for child in node.body:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                  ast.ClassDef)):
+                yield from _definitions(child)
+
+
+def _exported_names(tree):
+    """Return the names in a literal __all__, or None if there's none."""
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and
+                any(isinstance(target, ast.Name) and target.id == '__all__'
+                    for target in node.targets) and
+                isinstance(node.value, (ast.List, ast.Tuple)) and
+                all(isinstance(elt, ast.Constant) and
+                    isinstance(elt.value, str) for elt in node.value.elts)):
+            return {elt.value for elt in node.value.elts}
+    return None
+
+
+def _name(node):
+    """Return the last part of a name or dotted name node, or None."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _abstract(node):
+    """Tell whether a class node looks like an abstract base class."""
+    if any(_name(base) == 'ABC' for base in node.bases):
+        return True
+    if any(keyword.arg == 'metaclass' and _name(keyword.value) == 'ABCMeta'
+           for keyword in node.keywords):
+        return True
+    return any(_name(decorator) == 'abstractmethod'
+               for definition in _definitions(node)
+               for decorator in getattr(definition, 'decorator_list', ()))
+
+
+def _scan_module(module_name, source):
+    """Return manifest entries for the plugins defined in a module source."""
+    tree = ast.parse(source)
+    module_names, decorator_names = _hacks_aliases(tree)
+    exported = _exported_names(tree)
+    scanned = {}  # {name: (plugin, declared)}
+    not_plugins = set()  # local bases and abstract classes
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                 ast.ClassDef)):
+            continue
+        plugin = {'ref': module_name + ':' + node.name, 'eager': False}
+        plugin.update((kind, []) for kind in _KINDS)
+        declared = False
+        for base in getattr(node, 'bases', ()):
+            base_name = base.id if isinstance(base, ast.Name) else None
+            if base_name in scanned:  # inherit local declarations
+                not_plugins.add(base_name)
+                base_plugin, base_declared = scanned[base_name]
+                declared = declared or base_declared
+                plugin['eager'] = plugin['eager'] or base_plugin['eager']
+                for kind in _KINDS:
+                    plugin[kind].extend(n for n in base_plugin[kind]
+                                        if n not in plugin[kind])
+            elif _name(base) not in ('object', 'ABC'):
+                plugin['eager'] = True  # import to see what's inherited
+        for definition in _definitions(node):
+            if (definition is not node and
+                    definition.name in ('__on_enter__', '__on_exit__')):
+                plugin['eager'] = True
+            for decorator in definition.decorator_list:
+                declaration = _declaration(decorator,
+                                           module_names, decorator_names)
+                if declaration is None:
+                    continue
+                declared = True
+                decorator_name, names = declaration
+                kind = _DECLARATIONS[decorator_name]
+                if kind is None or names is None:
+                    plugin['eager'] = True
+                    continue
+                plugin[kind].extend(n for n in names if n not in plugin[kind])
+        if isinstance(node, ast.ClassDef) and _abstract(node):
+            not_plugins.add(node.name)  # only to derive plugins from
+        scanned[node.name] = plugin, declared
+    return [plugin for name, (plugin, declared) in scanned.items()
+            if declared and name not in not_plugins and
+            (exported is None or name in exported)]
+
+
+def scan(*packages):
+    """Scan packages or modules by name without importing, return a manifest."""
+    sources, plugins = {}, []
+    for package in packages:
+        for root in _package_roots(package):
+            for module_name, path in _walk_sources(package, root, sources):
+                with open(path, 'rb') as f:
+                    try:
+                        plugins.extend(_scan_module(module_name, f.read()))
+                    except SyntaxError:
+                        continue  # it won't import either
+
+    points = {kind: {} for kind in _KINDS}
+    for plugin in plugins:
+        for kind in _KINDS:
+            for name in plugin[kind]:
+                points[kind].setdefault(name, []).append(plugin['ref'])
+
+    return {'version': MANIFEST_VERSION, 'packages': list(packages),
+            'sources': sources, 'points': points, 'plugins': plugins}
+
+
+##########################
+# Writing and loading it #
+##########################
+
+def _dump(path, manifest):
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'  # writers may race
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def write(path, *packages):
+    """Scan packages and write a manifest to path, return the manifest."""
+    manifest = scan(*packages)
+    _dump(path, manifest)
+    return manifest
+
+
+def _stale(manifest):
+    for path, mtime in manifest['sources'].items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+# Hacks made from manifests, kept so that hacks.use gets the same objects
+# and can reuse its registries: {path: (manifest, hacks)}
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load(path, packages=None):
+    """
+    Return hacks to pass to hacks.use(...) from the manifest at path,
+    lazily imported where possible.
+    The manifest is rescanned and rewritten if its sources have changed;
+    if it's missing, it's written from scratch when packages are given.
+    """
+    path = os.path.abspath(path)
+    with _loaded_lock:
+        manifest, loaded_hacks = _loaded.get(path, (None, None))
+    if manifest is not None and not _stale(manifest):
+        return list(loaded_hacks)
+
+    manifest = _read(path)
+    if manifest is None and packages is None:
+        raise FileNotFoundError('no usable hacks manifest at ' + repr(path))
+    if manifest is None or _stale(manifest):
+        manifest = scan(*(packages or manifest['packages']))
+        try:
+            _dump(path, manifest)
+        except OSError:
+            pass  # read-only installation? Use it anyway.
+
+    loaded_hacks = [plugin['ref'] if plugin['eager'] else
+                    hacks.lazy(plugin['ref'], into=plugin['into'],
+                               around=plugin['around'], up=plugin['up'])
+                    for plugin in manifest['plugins']]
+    with _loaded_lock:
+        _loaded[path] = manifest, loaded_hacks
+    return list(loaded_hacks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m hacks.index',
+        description='Index hacks declared in packages without importing them.')
+    parser.add_argument('-o', '--output', default='hacks-index.json',
+                        help='manifest to write (default: %(default)s)')
+    parser.add_argument('packages', nargs='+', metavar='package',
+                        help='package or module name to scan')
+    args = parser.parse_args(argv)
+    manifest = write(args.output, *args.packages)
+    print('%s: %d plugins, %d plugging points' % (
+        args.output, len(manifest['plugins']),
+        sum(len(points) for points in manifest['points'].values())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import hacks
+
+
+#############################################################
+# hacks.acall: concurrent coroutine hooks, timeouts, errors #
+#############################################################
+
+@hacks.into('warm')
+async def slow_warmer(key):
+    await asyncio.sleep(.05)
+    return 'slow ' + key
+
+
+@hacks.into('warm')
+async def fast_warmer(key):
+    await asyncio.sleep(.01)
+    return 'fast ' + key
+
+
+@hacks.into('warm')
+def sync_warmer(key):
+    return 'sync ' + key
+
+
+@hacks.into('warm')
+async def nested_warmer(key):
+    await asyncio.sleep(0)
+    return hacks.call.nested()  # the registry is still there in the task
+
+
+@hacks.into('nested')
+def nested():
+    return 'nested'
+
+
+@hacks.into('fail')
+async def failing():
+    raise KeyError('failed')
+
+
+@hacks.into('fail')
+async def hanging():
+    await asyncio.sleep(10)
+
+
+@hacks.into('fail')
+async def working():
+    return 'worked'
+
+
+def test_acall_concurrent():
+    async def main():
+        with hacks.use(slow_warmer, fast_warmer, sync_warmer, nested_warmer,
+                       nested):
+            started = time.monotonic()
+            results = await hacks.acall.warm('k')
+            return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(main())
+    assert results == ['slow k', 'fast k', 'sync k', ['nested']]  # in order
+    assert elapsed < .05 + .01 + .03  # concurrently, not one after another
+
+
+def test_acall_frames_mode():
+    hacks.set_lookup_mode('frames')
+    try:
+        async def main():
+            with hacks.use(nested_warmer, nested):
+                return await hacks.acall.warm('k')
+        assert asyncio.run(main()) == [['nested']]
+    finally:
+        hacks.set_lookup_mode('context')
+
+
+def test_acall_errors_and_timeouts():
+    async def main():
+        with hacks.use(failing, hanging, working):
+            try:
+                await hacks.acall.fail()
+            except KeyError:
+                pass
+            else:
+                assert False
+            try:
+                await hacks.acall(timeout=.01).fail()
+            except KeyError:
+                pass
+            else:
+                assert False
+            return await hacks.acall(timeout=.01,
+                                     return_exceptions=True).fail()
+
+    failed, timed_out, worked = asyncio.run(main())
+    assert isinstance(failed, KeyError)
+    assert isinstance(timed_out, asyncio.TimeoutError)
+    assert worked == 'worked'
+
+
+def test_acall_nothing():
+    async def main():
+        assert await hacks.acall.warm('k') == []
+        with hacks.use(nested):
+            return await hacks.acall.warm('k')
+    assert asyncio.run(main()) == []
+
+
+@hacks.into('audit')
+@hacks.stealing
+async def auditing(event, user=hacks.steal):
+    await asyncio.sleep(0)
+    return event + ' by ' + user
+
+
+def test_acall_stealing():
+    async def main():
+        user = 'alice'
+        with hacks.use(auditing):
+            return await hacks.acall.audit('login')
+    assert asyncio.run(main()) == ['login by alice']
+
+
+def test_import_leaves_asyncio_alone():
+    subprocess.run([sys.executable, '-c',
+                    'import sys, hacks; assert "asyncio" not in sys.modules'],
+                   cwd=os.path.dirname(os.path.dirname(hacks.__file__)),
+                   check=True)
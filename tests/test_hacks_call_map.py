@@ -0,0 +1,100 @@
+import hacks
+
+
+############################################################
+# hacks.call_map: batched calls, @hacks.batched hook forms #
+############################################################
+
+@hacks.into('process_row')
+def doubling(row, scale=1):
+    return row * 2 * scale
+
+
+class Enricher:
+    def __init__(self):
+        self.batches = []
+
+    def enrich_all(self, rows, scale=1):
+        self.batches.append(list(rows))
+        return [str(row) * scale for row in rows]
+
+    @hacks.into('process_row')
+    @hacks.batched(enrich_all)
+    def enrich(self, row, scale=1):
+        return str(row) * scale
+
+
+def test_call_map():
+    enricher = Enricher()
+    with hacks.use(doubling, enricher):
+        assert hacks.call.process_row(3) == [6, '3']
+        assert enricher.batches == []
+
+        results = hacks.call_map.process_row(range(5), batch_size=2)
+        assert enricher.batches == []  # lazily
+        assert list(results) == [[0, '0'], [2, '1'], [4, '2'],
+                                 [6, '3'], [8, '4']]
+        assert enricher.batches == [[0, 1], [2, 3], [4]]
+
+        del enricher.batches[:]
+        assert list(hacks.call_map.process_row([1, 2], scale=2)) == [
+            [4, '11'], [8, '22']]
+        assert enricher.batches == [[1, 2]]
+
+
+@hacks.into('add')
+def adding(x, y):
+    return x + y
+
+
+@hacks.into('add')
+@hacks.batched(lambda xs, ys: [x * y for x, y in zip(xs, ys)])
+def not_really_adding(x, y):
+    return x * y
+
+
+@hacks.into('add')
+@hacks.stealing
+def stealing_adding(x, y, z=hacks.steal):
+    return x + y + z
+
+
+def test_call_map_several_iterables():
+    z = 100
+    with hacks.use(adding, not_really_adding, stealing_adding):
+        assert list(hacks.call_map.add([1, 2, 3], [10, 20])) == [
+            [11, 10, 111], [22, 40, 122]]
+
+
+@hacks.into('broken')
+@hacks.batched(lambda xs: xs[:-1])
+def broken(x):
+    return x
+
+
+def test_call_map_broken_batch_form():
+    with hacks.use(broken):
+        try:
+            list(hacks.call_map.broken([1, 2]))
+        except ValueError:
+            pass
+        else:
+            assert False
+
+
+def test_call_map_bad_batch_size():
+    with hacks.use(doubling):
+        for batch_size in (0, -1):
+            try:
+                hacks.call_map.process_row(range(3), batch_size=batch_size)
+            except ValueError:
+                pass
+            else:
+                assert False
+
+
+def test_call_map_without_hooks():
+    assert list(hacks.call_map.process_row(range(3))) == [[], [], []]
+    with hacks.use(doubling):
+        results = hacks.call_map.unhooked(range(2), batch_size=1)
+        assert list(results) == [[], []]
@@ -0,0 +1,83 @@
+import operator
+
+import hacks
+
+
+############################################################
+# hacks.call_iter, _first, _any, _all and _reduce variants #
+############################################################
+
+class Validators:
+    def __init__(self):
+        self.called = []
+
+    @hacks.into('validate', 'resolve')
+    def strict(self, value):
+        self.called.append('strict')
+        return None if value else False
+
+    @hacks.into('validate', 'resolve')
+    def tolerant(self, value):
+        self.called.append('tolerant')
+        return True
+
+    @hacks.into('validate', 'resolve')
+    def verbose(self, value):
+        self.called.append('verbose')
+        return len(str(value))
+
+
+def test_call_variants_short_circuit():
+    validators = Validators()
+    with hacks.use(validators):
+        assert hacks.call.validate(0) == [False, True, 1]
+        assert validators.called == ['strict', 'tolerant', 'verbose']
+
+        del validators.called[:]
+        assert hacks.call_all.validate(0) is False
+        assert validators.called == ['strict']
+
+        del validators.called[:]
+        assert hacks.call_any.validate(0) is True
+        assert validators.called == ['strict', 'tolerant']
+
+        del validators.called[:]
+        assert hacks.call_first.resolve(1) is True
+        assert validators.called == ['strict', 'tolerant']
+
+        del validators.called[:]
+        assert hacks.call_reduce(operator.add, 10).validate(0) == 12
+        assert validators.called == ['strict', 'tolerant', 'verbose']
+
+
+def test_call_iter_is_lazy():
+    validators = Validators()
+    with hacks.use(validators):
+        results = hacks.call_iter.validate(1)
+        assert validators.called == []
+        assert next(results) is None
+        assert validators.called == ['strict']
+        assert list(results) == [True, 1]
+
+
+def test_call_variants_without_hooks():
+    assert list(hacks.call_iter.validate(0)) == []
+    assert hacks.call_first.validate(0) is None
+    assert hacks.call_any.validate(0) is False
+    assert hacks.call_all.validate(0) is True
+    assert hacks.call_reduce(operator.add, 10).validate(0) == 10
+    with hacks.use(Validators()):
+        assert hacks.call_first.unhooked() is None
+
+
+@hacks.into('resolve')
+@hacks.stealing
+def stealing_resolver(value, fallback=hacks.steal):
+    return fallback
+
+
+def test_call_variants_stealing():
+    fallback = 'stolen'
+    with hacks.use(stealing_resolver):
+        assert hacks.call_first.resolve(0) == 'stolen'
+        assert list(hacks.call_iter.resolve(0)) == ['stolen']
@@ -0,0 +1,104 @@
+import importlib.metadata
+import os
+import shutil
+import sys
+import tempfile
+
+import hacks
+import hacks.discovery
+
+
+#################################################################
+# hacks.use_discovered: plugins advertised through entry points #
+#################################################################
+
+PLUGIN_SOURCE = '''
+import hacks
+
+@hacks.into('discovered')
+def greeter():
+    return 'greeter'
+
+class Shouter:
+    @hacks.into('discovered')
+    def shout(self):
+        return 'SHOUTER'
+
+def __on_enter__(frameinfo):
+    pass
+'''
+
+ENTRY_POINTS = '''
+[hacks.plugins]
+greeter = dummy_hacks_plugin:greeter
+shouter = dummy_hacks_plugin:Shouter
+whole = dummy_hacks_plugin
+
+[other.group]
+ignored = dummy_hacks_plugin:greeter
+'''
+
+
+def install_dummy_distribution(tmpdir):
+    dist_info = os.path.join(tmpdir, 'dummy_hacks_dist-1.0.dist-info')
+    os.mkdir(dist_info)
+    files = {
+        os.path.join(tmpdir, 'dummy_hacks_plugin.py'): PLUGIN_SOURCE,
+        os.path.join(dist_info, 'METADATA'):
+            'Metadata-Version: 2.1\nName: dummy-hacks-dist\nVersion: 1.0\n',
+        os.path.join(dist_info, 'entry_points.txt'): ENTRY_POINTS,
+        os.path.join(dist_info, 'RECORD'):
+            'dummy_hacks_plugin.py,,\n'
+            'dummy_hacks_dist-1.0.dist-info/METADATA,,\n',
+    }
+    for path, content in files.items():
+        with open(path, 'w') as f:
+            f.write(content)
+    sys.path.insert(0, tmpdir)
+
+
+def test_use_discovered():
+    tmpdir = tempfile.mkdtemp()
+    index_path = os.path.join(tmpdir, 'cache', 'discovery.json')
+    install_dummy_distribution(tmpdir)
+    try:
+        entries = hacks.discovery.discover(index_path=index_path)
+        assert [(e['name'], e['dist'], e['into'], e['eager'])
+                for e in entries] == [
+            ('greeter', 'dummy-hacks-dist', ['discovered'], False),
+            ('shouter', 'dummy-hacks-dist', ['discovered'], False),
+            ('whole', 'dummy-hacks-dist', [], True),
+        ]
+        assert os.path.exists(index_path)
+
+        with hacks.use_discovered(index_path=index_path, exclude=['whole']):
+            assert 'dummy_hacks_plugin' not in sys.modules
+            assert hacks.call.discovered() == ['greeter', 'SHOUTER']
+        with hacks.use_discovered(index_path=index_path,
+                                  select=lambda e: e['name'] == 'shouter'):
+            assert hacks.call.discovered() == ['SHOUTER']
+        with hacks.use_discovered(index_path=index_path, names=['whole']):
+            assert hacks.call.discovered() == ['greeter', 'SHOUTER']
+
+        # Another process start: the index is used, entry points aren't read
+        original_distributions = importlib.metadata.distributions
+        def forbidden_distributions(*a, **kwa):
+            raise AssertionError('entry points scanned again')
+        importlib.metadata.distributions = forbidden_distributions
+        try:
+            assert hacks.discovery.discover(index_path=index_path) == entries
+        finally:
+            importlib.metadata.distributions = original_distributions
+
+        # Changing the installed distributions invalidates it
+        entry_points = os.path.join(tmpdir, 'dummy_hacks_dist-1.0.dist-info',
+                                    'entry_points.txt')
+        with open(entry_points, 'w') as f:
+            f.write('[hacks.plugins]\ngreeter = dummy_hacks_plugin:greeter\n')
+        os.utime(entry_points, ns=(1, 1))
+        rescanned = hacks.discovery.discover(index_path=index_path)
+        assert [e['name'] for e in rescanned] == ['greeter']
+    finally:
+        sys.path.remove(tmpdir)
+        sys.modules.pop('dummy_hacks_plugin', None)
+        shutil.rmtree(tmpdir)
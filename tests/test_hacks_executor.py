@@ -0,0 +1,66 @@
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+
+import hacks
+
+
+#############################################################
+# hacks.wrap_task and hacks.Executor: registries in workers #
+#############################################################
+
+@hacks.into('greet')
+def greeter(name):
+    return 'hello ' + name
+
+
+def greet(name='world'):
+    return hacks.call.greet(name)
+
+
+def greet_from_process(name):
+    return os.getpid(), hacks.call.greet(name)
+
+
+def test_wrap_task_thread():
+    results = []
+    with hacks.use(greeter):
+        plain = threading.Thread(target=lambda: results.append(greet()))
+        wrapped = threading.Thread(
+            target=hacks.wrap_task(lambda: results.append(greet())))
+    for thread in plain, wrapped:
+        thread.start()
+        thread.join()
+    assert results == [[], ['hello world']]
+    assert hacks.wrap_task(greet)() == []
+
+
+def test_executor_thread_pool():
+    with hacks.Executor(concurrent.futures.ThreadPoolExecutor(2)) as pool:
+        assert pool.submit(greet).result() == []
+        with hacks.use(greeter):
+            future = pool.submit(greet, name='pool')
+            mapped = pool.map(greet, ['a', 'b', 'c'])
+        # captured on submission, not when it runs
+        assert future.result() == ['hello pool']
+        assert list(mapped) == [['hello a'], ['hello b'], ['hello c']]
+        assert pool.submit(greet).result() == []
+
+
+# fork where available, spawn elsewhere (e.g. Windows),
+# which needs the hooks here to be importable, at module level
+START_METHOD = ('fork' if 'fork' in multiprocessing.get_all_start_methods()
+                else 'spawn')
+
+
+def test_executor_process_pool():
+    context = multiprocessing.get_context(START_METHOD)
+    inner = concurrent.futures.ProcessPoolExecutor(2, mp_context=context)
+    with hacks.Executor(inner) as pool:
+        with hacks.use(greeter):
+            results = list(pool.map(greet_from_process, ['x', 'y']))
+        assert pool.submit(greet_from_process, 'z').result()[1] == []
+    assert all(pid != os.getpid() for pid, _ in results)
+    assert [greeting for _, greeting in results] == [['hello x'],
+                                                     ['hello y']]
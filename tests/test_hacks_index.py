@@ -0,0 +1,201 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import hacks
+import hacks.index
+
+
+##################################################################
+# hacks.index: a manifest of plugins that are imported on demand #
+##################################################################
+
+GREET_SOURCE = '''
+import hacks
+from hacks import around as hack_around
+
+@hacks.into('greet')
+def hello():
+    return 'hello'
+
+class Shouter:
+    @hacks.into('greet')
+    def shout(self):
+        return 'HELLO'
+
+    class Inner:
+        @hack_around('greeting')
+        def wrap(self, func):
+            return lambda: '<' + func() + '>'
+
+def not_a_plugin():
+    pass
+'''
+
+EAGER_SOURCE = '''
+import hacks
+
+class Eager:
+    def __on_enter__(self, frameinfo):
+        pass
+
+    @hacks.into('eager')
+    def eager(self):
+        return 'eager'
+'''
+
+MORE_SOURCE = '''
+import hacks
+
+@hacks.into('greet')
+def more():
+    return 'more'
+'''
+
+
+@hacks.friendly('greeting')
+def greeting():
+    return 'hi'
+
+
+def make_package():
+    tmpdir = tempfile.mkdtemp()
+    pkgdir = os.path.join(tmpdir, 'index_demo')
+    os.mkdir(pkgdir)
+    for filename, source in (('__init__.py', ''),
+                             ('greet.py', GREET_SOURCE),
+                             ('eager.py', EAGER_SOURCE)):
+        with open(os.path.join(pkgdir, filename), 'w') as f:
+            f.write(source)
+    return tmpdir, pkgdir
+
+
+def test_index():
+    tmpdir, pkgdir = make_package()
+    manifest_path = os.path.join(tmpdir, 'hacks-index.json')
+    sys.path.insert(0, tmpdir)
+    try:
+        hacks.index.main(['-o', manifest_path, 'index_demo'])
+        manifest = hacks.index.load(manifest_path)
+        assert [str(h) for h in manifest] == [
+            'index_demo.eager:Eager',
+            '<lazy hack index_demo.greet:hello>',
+            '<lazy hack index_demo.greet:Shouter>',
+        ]
+        written = hacks.index._read(manifest_path)
+        assert written['points'] == {
+            'into': {'eager': ['index_demo.eager:Eager'],
+                     'greet': ['index_demo.greet:hello',
+                               'index_demo.greet:Shouter']},
+            'around': {'greeting': ['index_demo.greet:Shouter']},
+            'up': {},
+        }
+
+        with hacks.use(*manifest[1:]):
+            assert 'index_demo.greet' not in sys.modules
+            assert hacks.call.something_else() == []
+            assert 'index_demo.greet' not in sys.modules
+            assert hacks.call.greet() == ['hello', 'HELLO']
+            assert greeting() == '<hi>'
+        with hacks.use(*manifest):
+            assert hacks.call.eager() == ['eager']
+            assert hacks.call.greet() == ['hello', 'HELLO']
+
+        # Same objects for the same manifest, until the sources change
+        assert hacks.index.load(manifest_path)[1] is manifest[1]
+        with open(os.path.join(pkgdir, 'more.py'), 'w') as f:
+            f.write(MORE_SOURCE)
+        reloaded = hacks.index.load(manifest_path)
+        assert repr(reloaded[-1]) == '<lazy hack index_demo.more:more>'
+        rewritten = hacks.index._read(manifest_path)
+        assert rewritten['points']['into']['greet'][-1] == 'index_demo.more:more'
+    finally:
+        sys.path.remove(tmpdir)
+        for module_name in list(sys.modules):
+            if module_name.startswith('index_demo'):
+                del sys.modules[module_name]
+        shutil.rmtree(tmpdir)
+
+
+def test_index_eager_declarations():
+    plugins = hacks.index._scan_module('m', b"""
+import hacks as h
+
+@h.on_top_of('m:dependency')
+class Dependent:
+    @h.into('x')
+    def x(self):
+        pass
+
+NAME = 'y'
+
+@h.into(NAME)
+def named_elsewhere():
+    pass
+
+@h.before('z')
+def literal():
+    pass
+
+@h.stateful
+class Stateful:
+    @h.into('w')
+    def w(self):
+        pass
+""")
+    assert [(p['ref'], p['eager'], p['into'], p['around']) for p in plugins] == [
+        ('m:Dependent', True, ['x'], []),
+        ('m:named_elsewhere', True, [], []),
+        ('m:literal', False, [], ['z']),
+        ('m:Stateful', True, ['w'], []),
+    ]
+
+
+def test_index_class_plugins():
+    plugins = hacks.index._scan_module('m', b"""
+import abc
+import hacks
+from elsewhere import Base
+
+class Mixin:
+    @hacks.into('x')
+    def x(self):
+        pass
+
+class Mixed(Mixin):
+    @hacks.into('y')
+    def y(self):
+        pass
+
+class Inheriting(Mixin):
+    pass
+
+class Abstract(abc.ABC):
+    @abc.abstractmethod
+    @hacks.into('z')
+    def z(self):
+        pass
+
+class Concrete(Abstract):
+    def z(self):
+        pass
+
+class Derived(Base):
+    @hacks.into('w')
+    def w(self):
+        pass
+
+class Unexported:
+    @hacks.into('v')
+    def v(self):
+        pass
+
+__all__ = ['Mixed', 'Inheriting', 'Abstract', 'Concrete', 'Derived']
+""")
+    assert [(p['ref'], p['eager'], p['into']) for p in plugins] == [
+        ('m:Mixed', False, ['x', 'y']),
+        ('m:Inheriting', False, ['x']),
+        ('m:Concrete', False, ['z']),
+        ('m:Derived', True, ['w']),
+    ]
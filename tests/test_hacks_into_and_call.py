@@ -83,3 +83,48 @@ def test_hack_into_collect_values():
 
 def use_hack_names_from_other_function():
     return hack_names()
+
+
+##########################################################
+# hacks.call: dispatchers are compiled once per registry #
+##########################################################
+
+def test_dispatchers_are_reused():
+    assert hacks.call.get_name() == []
+    with hacks.use(alice):
+        registry = hacks.get_recent_plugins_registry()
+        assert hacks.call.get_name is hacks.call.get_name
+        assert hacks.call.get_name() == ['Alice']
+        assert hacks.call.nobody_hooked_into_this() == []
+        assert 'nobody_hooked_into_this' not in registry._hacks_into
+        assert (hacks.call.nobody_hooked_into_this is
+                hacks.call.neither_into_that)
+
+
+###################################################################
+# Nested hacks.use: inherited hacks are not registered once again #
+###################################################################
+
+instantiations = []
+
+class Carol:
+    def __init__(self):
+        instantiations.append(self)
+
+    @hacks.into('get_name')
+    def get_name(self):
+        return 'Carol'
+
+
+def test_nested_use_inherits_tables():
+    del instantiations[:]
+    with hacks.use(Carol):
+        assert hack_names() == ['Carol']
+        with hacks.use(alice):
+            inner_registry = hacks.get_recent_plugins_registry()
+            assert hack_names() == ['Carol', 'Alice']
+            with hacks.use(Bob):
+                assert hack_names() == ['Carol', 'Alice', 'Bob']
+    assert len(instantiations) == 1
+    assert list(inner_registry._hacks_into) == ['get_name']
+    assert inner_registry._hacks_into['get_name'] == [alice]
@@ -0,0 +1,107 @@
+import collections
+import gc
+import threading
+
+import hacks
+
+
+##############################################################
+# hacks.introspect(): registries, caches, objects and frames #
+##############################################################
+
+@hacks.friendly_class('Pet')
+class Pet:
+    def sound(self):
+        return '...'
+
+
+@hacks.up('Pet')
+def barking(cls):
+    class Dog(cls):
+        def sound(self):
+            return 'woof'
+    return Dog
+
+
+@hacks.friendly('feed')
+def feed():
+    return 'fed'
+
+
+@hacks.around('feed')
+def overfeeding(func):
+    return lambda: func() * 2
+
+
+def suspended_generator():
+    with hacks.use(overfeeding, interned=False):
+        yield feed()
+
+
+def test_introspect():
+    pets = [Pet() for _ in range(3)]
+    gen = suspended_generator()
+    with hacks.use(barking, interned=False):
+        registry = hacks.get_recent_plugins_registry()
+        assert [pet.sound() for pet in pets] == ['woof'] * 3
+        assert next(gen) == 'fedfed'
+
+        state = hacks.introspect()
+        infos = {info.registry: info for info in state.registries}
+        assert registry in infos
+        info = infos[registry]
+        assert info.parent is None and not info.interned and info.hacks == 1
+        assert info.wrapper_caches == 1
+        assert [cls.__name__ for cls in info.up_classes] == ['Dog']
+        assert state.class_hoppers >= 3
+        assert any(c.names == ('Pet',) and c.size >= 1
+                   for c in state.wrapper_caches)
+
+        marked = [f for f in state.marked_frames
+                  if f.function in ('test_introspect', 'suspended_generator')]
+        assert [(f.function, f.thread) for f in marked] == [
+            ('test_introspect', threading.get_ident()),
+            ('suspended_generator', None),
+        ]
+        assert marked[0].registries == [registry]
+
+    gen.close()
+    hoppers = state.class_hoppers
+    del pets, state, infos, info
+    gc.collect()
+    state = hacks.introspect()
+    assert state.class_hoppers == hoppers - 3
+    assert not any(f.function in ('test_introspect', 'suspended_generator')
+                   for f in state.marked_frames)
+
+
+def test_introspect_leaves_friendly_objects_alone():
+    with hacks.use(overfeeding, interned=False):
+        registry = hacks.get_recent_plugins_registry()
+        hacks.introspect()
+        assert not registry._wrapper_caches
+
+
+@hacks.friendly_class('Point')
+class Point(collections.namedtuple('Point', 'x y')):
+    def norm(self):
+        return abs(self.x) + abs(self.y)
+
+
+@hacks.up('Point')
+def squaring(cls):
+    class SquaredPoint(cls):
+        def norm(self):
+            return self.x ** 2 + self.y ** 2
+    return SquaredPoint
+
+
+def test_introspect_unreferenceable_class_hoppers():
+    hoppers = hacks.introspect().class_hoppers
+    point = Point(1, -2)  # tuples can't be referenced weakly
+    assert point.norm() == 3
+    with hacks.use(squaring):
+        assert point.norm() == 5
+        assert Point(3, 4).norm() == 25
+    assert (point.x, point.y) == (1, -2)
+    assert hacks.introspect().class_hoppers == hoppers
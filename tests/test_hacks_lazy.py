@@ -0,0 +1,113 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import hacks
+
+
+#############################################################
+# hacks.lazy: importing 'module:attr' hacks on first demand #
+#############################################################
+
+HEAVY_SOURCE = '''
+import hacks
+
+@hacks.into('heavy')
+def heavy():
+    return 'heavy'
+
+@hacks.around('lazy_wrapped')
+def wrap(func):
+    return lambda: func() + '!'
+
+@hacks.up('LazyClass')
+def hop(cls):
+    class Hopped(cls):
+        def who(self):
+            return 'hopped'
+    return Hopped
+
+class Tally:
+    def __init__(self):
+        self.calls = 0
+
+    @hacks.into('tally')
+    def tally(self):
+        self.calls += 1
+        return self.calls
+'''
+
+
+@hacks.friendly('lazy_wrapped')
+def lazy_wrapped():
+    return 'wrapped'
+
+
+@hacks.friendly_class('LazyClass')
+class LazyClass:
+    def who(self):
+        return 'original'
+
+
+def with_heavy_module(test):
+    def wrapper():
+        tmpdir = tempfile.mkdtemp()
+        with open(os.path.join(tmpdir, 'lazy_heavy.py'), 'w') as f:
+            f.write(HEAVY_SOURCE)
+        sys.path.insert(0, tmpdir)
+        try:
+            test()
+        finally:
+            sys.path.remove(tmpdir)
+            sys.modules.pop('lazy_heavy', None)
+            shutil.rmtree(tmpdir)
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@with_heavy_module
+def test_lazy_call():
+    heavy = hacks.lazy('lazy_heavy:heavy', into=['heavy'])
+    assert hacks.lazy('lazy_heavy:heavy', into=['heavy']) is heavy
+    with hacks.use(heavy, interned=False):
+        assert hacks.call.light() == []
+        assert 'lazy_heavy' not in sys.modules
+        assert hacks.call.heavy() == ['heavy']
+        assert 'lazy_heavy' in sys.modules
+
+
+@with_heavy_module
+def test_lazy_around():
+    wrap = hacks.lazy('lazy_heavy:wrap', around=['lazy_wrapped'])
+    with hacks.use(wrap, interned=False):
+        assert hacks.call.heavy() == []
+        assert 'lazy_heavy' not in sys.modules
+        assert lazy_wrapped() == 'wrapped!'
+
+
+@with_heavy_module
+def test_lazy_up():
+    obj = LazyClass()
+    hop = hacks.lazy('lazy_heavy:hop', up=['LazyClass'])
+    with hacks.use(hop, interned=False):
+        assert lazy_wrapped() == 'wrapped'
+        assert 'lazy_heavy' not in sys.modules
+        assert obj.who() == 'hopped'
+    assert obj.who() == 'original'
+
+
+@with_heavy_module
+def test_lazy_class_instance_per_registry():
+    tally = hacks.lazy('lazy_heavy:Tally', into=['tally'])
+    for _ in range(2):
+        with hacks.use(tally, interned=False):
+            assert hacks.call.tally() == [1]
+            assert hacks.call.tally() == [2]
+    stateful = hacks.lazy('lazy_heavy:Tally', into=['tally'], stateful=True)
+    for _ in range(2):
+        with hacks.use(stateful):
+            assert hacks.call.tally() == [1]
+    for calls in 1, 2:  # interned, reused
+        with hacks.use(tally):
+            assert hacks.call.tally() == [calls]
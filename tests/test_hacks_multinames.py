@@ -57,3 +57,15 @@ def test_hacks_multinames():
         print( s.phrase() )
         assert s.phrase() == 'GREAT34'
     assert s.phrase() == 'GREAT'
+
+
+def test_hacks_multinames_nested():
+    s = Speaker('GREAT')
+    s = hacks.friendly('c', 'd')(s)
+    with hacks.use(add_3):
+        with hacks.use(add_4):  # can be applied on top
+            assert s.phrase() == 'GREAT34'
+    with hacks.use(add_4):
+        with hacks.use(add_3):  # still applied before add_4
+            assert s.phrase() == 'GREAT34'
+    assert s.phrase() == 'GREAT'
@@ -0,0 +1,145 @@
+import concurrent.futures
+import gc
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+
+import hacks
+
+
+###########################################################################
+# hacks.call_on and hacks.set_executor: hooks on thread and process pools #
+###########################################################################
+
+def sleepy(i):
+    @hacks.into('enrich')
+    def enricher(record):
+        time.sleep(.05)
+        return (i, record, hacks.call.nested())
+    enricher.__name__ = enricher.__qualname__ = 'enricher_%d' % i
+    return enricher
+
+
+@hacks.into('nested')
+def nested():
+    return threading.current_thread().name != 'MainThread'
+
+
+@hacks.into('enrich')
+@hacks.stealing
+def stealing_enricher(record, source=hacks.steal):
+    return source
+
+
+@hacks.into('explode')
+def exploding():
+    raise KeyError('boom')
+
+
+def test_call_on_thread_pool():
+    enrichers = [sleepy(i) for i in range(4)]
+    source = 'db'
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        with hacks.use(*enrichers + [nested, stealing_enricher]):
+            started = time.monotonic()
+            results = hacks.call_on(pool).enrich('r')
+            elapsed = time.monotonic() - started
+        assert results == [(i, 'r', [True]) for i in range(4)] + ['db']
+        assert elapsed < 4 * .05  # not one after another
+        assert hacks.call_on(pool).enrich('r') == []
+
+
+def test_set_executor():
+    enrichers = [sleepy(i) for i in range(4)]
+    source = 'db'
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        with hacks.use(*enrichers + [nested, stealing_enricher]):
+            assert hacks.call.enrich('r')[0] == (0, 'r', [False])
+            hacks.set_executor('enrich', pool)
+            try:
+                started = time.monotonic()
+                results = hacks.call.enrich('r')
+                assert time.monotonic() - started < 4 * .05
+                assert results == [(i, 'r', [True]) for i in range(4)] + ['db']
+            finally:
+                hacks.set_executor('enrich', None)
+            assert hacks.call.enrich('r')[0] == (0, 'r', [False])
+
+
+def test_set_executor_with_stats():
+    enrichers = [sleepy(i) for i in range(4)]
+    source = 'db'
+    hacks.stats(reset=True)
+    hacks.enable_stats()
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        hacks.set_executor('enrich', pool)
+        try:
+            with hacks.use(*enrichers + [nested, stealing_enricher]):
+                started = time.monotonic()
+                results = hacks.call.enrich('r')
+                assert time.monotonic() - started < 4 * .05
+        finally:
+            hacks.set_executor('enrich', None)
+            hacks.disable_stats()
+    assert results == [(i, 'r', [True]) for i in range(4)] + ['db']
+    points = {point.name: point for point in hacks.stats(reset=True).points}
+    assert points['enrich'].calls == 1 and points['enrich'].hooks == 5
+
+
+def test_set_executor_dispatcher_outliving_registry():
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        hacks.set_executor('nested', pool)
+        try:
+            with hacks.use(nested, interned=False):
+                dispatch = hacks.call.nested
+            gc.collect()
+            assert dispatch() == [True]
+        finally:
+            hacks.set_executor('nested', None)
+
+
+def test_call_on_errors():
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        with hacks.use(exploding):
+            try:
+                hacks.call_on(pool).explode()
+            except KeyError:
+                pass
+            else:
+                assert False
+
+
+@hacks.into('where')
+def where():
+    return os.getpid(), hacks.call.nested_where()
+
+
+@hacks.into('nested_where')
+def nested_where():
+    return 'nested'
+
+
+def test_registry_pickling():
+    with hacks.use(where, nested_where):
+        registry = hacks.get_recent_plugins_registry()
+        assert pickle.loads(pickle.dumps(registry)) is registry
+    lazy_registry = hacks.use(hacks.lazy('os.path:join', into=['join']))
+    unpickled = pickle.loads(pickle.dumps(lazy_registry))
+    assert unpickled._new_hacks_list == lazy_registry._new_hacks_list
+
+
+# fork where available, spawn elsewhere (e.g. Windows),
+# which needs the hooks here to be importable, at module level
+START_METHOD = ('fork' if 'fork' in multiprocessing.get_all_start_methods()
+                else 'spawn')
+
+
+def test_call_on_process_pool():
+    context = multiprocessing.get_context(START_METHOD)
+    with concurrent.futures.ProcessPoolExecutor(2, mp_context=context) as pool:
+        with hacks.use(where, nested_where):
+            [(pid, nested_results)] = hacks.call_on(pool).where()
+    assert pid != os.getpid()
+    assert nested_results == ['nested']
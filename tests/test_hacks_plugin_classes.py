@@ -0,0 +1,71 @@
+import inspect
+import types
+
+import hacks
+
+
+########################################################
+# Class-based plugins: methods, inner classes, modules #
+########################################################
+
+def calls():
+    return hacks.call.report()
+
+
+class PluginPack:
+    @hacks.into('report')
+    def report(self):
+        return 'method'
+
+    def not_a_hook(self):
+        return 'never called'
+
+    class Inner:
+        @hacks.into('report')
+        def report(self):
+            return 'inner method'
+
+    @staticmethod
+    @hacks.into('report')
+    def static_report():
+        return 'static method'
+
+
+def test_plugin_pack():
+    with hacks.use(PluginPack):
+        assert calls() == ['method', 'static method', 'inner method']
+
+
+def test_plugin_instance_attributes():
+    pack = PluginPack()
+    pack.extra = hacks.into('report')(lambda: 'instance attribute')
+    with hacks.use(pack):
+        assert calls() == ['instance attribute', 'method', 'static method',
+                           'inner method']
+
+
+def test_plugin_module():
+    module = types.ModuleType('plugin_module')
+    module.report = hacks.into('report')(lambda: 'module function')
+    module.Inner = PluginPack.Inner
+    with hacks.use(module):
+        assert calls() == ['module function', 'inner method']
+
+
+def test_plugin_layout_is_memoized():
+    class FreshPack(PluginPack):
+        pass
+    original_getmembers = inspect.getmembers
+    introspected = []
+    def counting_getmembers(obj, *a, **kwa):
+        introspected.append(obj)
+        return original_getmembers(obj, *a, **kwa)
+    inspect.getmembers = counting_getmembers
+    try:
+        for i in range(3):
+            with hacks.use(FreshPack, interned=False):
+                assert calls() == ['method', 'static method', 'inner method']
+    finally:
+        inspect.getmembers = original_getmembers
+    assert FreshPack in introspected
+    assert len(introspected) == len(set(introspected))  # once per class
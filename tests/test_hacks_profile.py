@@ -0,0 +1,120 @@
+import inspect
+import os
+import tempfile
+import time
+
+import hacks
+
+
+##############################################################
+# hacks.profile(): time spent in layers, attributed to hacks #
+##############################################################
+
+@hacks.friendly('slowpoke')
+def slowpoke():
+    time.sleep(.002)
+    return 'done'
+
+
+@hacks.around('slowpoke')
+def dawdling(func):
+    def dawdling_func():
+        time.sleep(.004)
+        return func()
+    return dawdling_func
+
+
+@hacks.before('slowpoke')
+def watching(original):
+    pass
+
+
+@hacks.friendly_class('Tortoise')
+class Tortoise:
+    def walk(self):
+        time.sleep(.002)
+        return 'walked'
+
+
+@hacks.up('Tortoise')
+def hurrying(cls):
+    class HurriedTortoise(cls):
+        def walk(self):
+            return 'hurriedly ' + super().walk()
+    return HurriedTortoise
+
+
+def test_profile_around():
+    with hacks.use(dawdling, watching):
+        assert slowpoke() == 'done'  # wrapped without timing
+        with hacks.profile() as profiler:
+            for _ in range(3):
+                assert slowpoke() == 'done'
+        assert slowpoke() == 'done'  # and without timing again
+
+    layers = {layer.layer.rsplit('.', 1)[-1]: layer
+              for layer in profiler.layers()}
+    assert set(layers) == {'slowpoke', 'dawdling', 'watching'}
+    assert all(layer.calls == 3 for layer in layers.values())
+    assert .006 <= layers['slowpoke'].time < layers['dawdling'].time
+    assert layers['watching'].time < layers['slowpoke'].time
+
+    stacks = profiler.collapsed().splitlines()
+    assert len(stacks) == 3
+    outermost, middle, innermost = (s.rsplit(' ', 1)[0].split(';')
+                                    for s in sorted(stacks, key=len))
+    assert outermost[0].endswith('.watching')
+    assert middle[1].endswith('.dawdling')
+    assert innermost[2].endswith('.slowpoke')
+    assert all(int(s.rsplit(' ', 1)[1]) >= 0 for s in stacks)
+
+
+@hacks.around('slowpoke')
+def labelling(func):
+    def labelled_slowpoke():
+        """Labelled."""
+        return func()
+    labelled_slowpoke.label = 'slow'
+    return labelled_slowpoke
+
+
+def test_profile_keeps_appearances():
+    with hacks.use(labelling):
+        assert slowpoke.__name__ == 'labelled_slowpoke'
+        with hacks.profile():
+            assert slowpoke.__name__ == 'labelled_slowpoke'
+            assert slowpoke.__doc__ == 'Labelled.'
+            assert slowpoke.label == 'slow'
+            assert slowpoke() == 'done'
+
+
+def test_profile_leaves_before_after_alone():
+    # hacks.profile() labels them by the function they call, without
+    # making inspect think they're wrapping it
+    assert inspect.unwrap(watching) is watching
+    assert list(inspect.signature(watching).parameters) == [
+        'ignored_self_and_original_func']
+
+
+def test_profile_up():
+    tortoise = Tortoise()
+    with hacks.use(hurrying):
+        with hacks.profile() as profiler:
+            assert tortoise.walk() == 'hurriedly walked'
+    assert tortoise.walk() == 'walked'
+
+    layers = {layer.layer.rsplit('.', 1)[-1]: layer
+              for layer in profiler.layers()}
+    assert set(layers) == {'Tortoise:walk', 'hurrying:walk'}
+    assert layers['Tortoise:walk'].time >= .002
+    assert layers['hurrying:walk'].time < layers['Tortoise:walk'].time
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'hacks.folded')
+        profiler.write_collapsed(path)
+        with open(path) as f:
+            assert f.read() == profiler.collapsed()
+    finally:
+        os.unlink(path)
+        os.rmdir(tmpdir)
@@ -0,0 +1,233 @@
+import inspect
+import threading
+import types
+
+import hacks
+
+
+#########################################################
+# Active registry lookup: nesting, threads, stack depth #
+#########################################################
+
+@hacks.into('whoami')
+def outer():
+    return 'outer'
+
+
+@hacks.into('whoami')
+def inner():
+    return 'inner'
+
+
+def deep(n, func=lambda: hacks.call.whoami()):
+    if n:
+        return deep(n - 1, func)
+    return func()
+
+
+def test_lookup_nesting():
+    assert hacks.get_recent_plugins_registry() is None
+    with hacks.use(outer):
+        outer_registry = hacks.get_recent_plugins_registry()
+        assert deep(50) == ['outer']
+        with hacks.use(inner, only=True):
+            assert hacks.get_recent_plugins_registry() is not outer_registry
+            assert deep(50) == ['inner']
+        assert hacks.get_recent_plugins_registry() is outer_registry
+        assert deep(50) == ['outer']
+    assert hacks.get_recent_plugins_registry() is None
+    assert deep(50) == []
+
+
+def test_lookup_thread_isolation():
+    seen = []
+    with hacks.use(outer):
+        thread = threading.Thread(target=lambda: seen.append(deep(5)))
+        thread.start()
+        thread.join()
+        assert deep(5) == ['outer']
+    assert seen == [[]]
+
+
+@hacks.friendly('shared')
+def shared():
+    return 'shared'
+
+
+def test_lookup_thread_isolation_under_load():
+    def worker(wid):
+        @hacks.into('whoami')
+        def whoami():
+            return wid
+
+        @hacks.around('shared')
+        def tagging(func):
+            return lambda: (wid, func())
+
+        barrier.wait()
+        for _ in range(200):
+            with hacks.use(whoami, tagging):
+                if deep(5) != [wid] or shared() != (wid, 'shared'):
+                    failures.append(wid)
+            if deep(5) != []:
+                failures.append(wid)
+
+    barrier, failures = threading.Barrier(8), []
+    threads = [threading.Thread(target=worker, args=(wid,))
+               for wid in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert failures == []
+
+
+def scoped_generator():
+    with hacks.use(inner):
+        yield hacks.call.whoami()
+        yield hacks.call.whoami()
+
+
+def test_lookup_generator_scope():
+    gen = scoped_generator()
+    assert next(gen) == ['inner']
+    assert hacks.call.whoami() == []  # suspended, doesn't leak out
+    with hacks.use(outer):
+        assert hacks.call.whoami() == ['outer']
+    assert next(gen) == ['inner']
+    assert hacks.call.whoami() == []
+    assert list(gen) == []
+
+
+def test_lookup_generator_closed_in_another_thread():
+    gen = scoped_generator()
+    assert next(gen) == ['inner']
+    thread = threading.Thread(target=gen.close)
+    thread.start()
+    thread.join()
+    assert hacks.get_recent_plugins_registry() is None
+    assert hacks.call.whoami() == []
+
+
+def test_lookup_generator_resumed_in_another_thread():
+    gen = scoped_generator()
+    assert next(gen) == ['inner']
+    seen = []
+    def resume():
+        seen.append(next(gen))
+        seen.append(hacks.call.whoami())
+    with hacks.use(outer):
+        thread = threading.Thread(target=resume)
+        thread.start()
+        thread.join()
+        assert hacks.call.whoami() == ['outer']
+    assert seen == [['inner'], []]
+    assert hacks.call.whoami() == []
+    assert list(gen) == []
+
+
+@types.coroutine
+def suspend():
+    yield
+
+
+async def scoped_coroutine():
+    with hacks.use(inner):
+        await suspend()
+
+
+def test_lookup_coroutine_closed_in_another_thread():
+    coro = scoped_coroutine()
+    coro.send(None)
+    assert hacks.call.whoami() == ['inner']  # follows the context, for tasks
+    thread = threading.Thread(target=coro.close)
+    thread.start()
+    thread.join()
+    assert hacks.get_recent_plugins_registry() is None
+    assert hacks.call.whoami() == []
+
+
+def test_lookup_does_not_inspect_stack():
+    original_stack = inspect.stack
+    def forbidden_stack(*a, **kwa):
+        raise AssertionError('inspect.stack() called')
+    inspect.stack = forbidden_stack
+    try:
+        with hacks.use(outer):
+            registry = deep(10, hacks.get_recent_plugins_registry)
+            assert registry is not None
+    finally:
+        inspect.stack = original_stack
+
+
+#####################################################
+# hacks.set_lookup_mode('frames'): call stack scope #
+#####################################################
+
+def test_lookup_frames_mode():
+    hacks.set_lookup_mode('frames')
+    try:
+        assert deep(20) == []
+        with hacks.use(outer):
+            assert deep(20) == ['outer']
+            with hacks.use(inner):
+                assert deep(20) == ['outer', 'inner']
+            assert deep(20) == ['outer']
+        assert deep(20) == []
+    finally:
+        hacks.set_lookup_mode('context')
+
+
+def test_lookup_frames_mode_generator_scope():
+    hacks.set_lookup_mode('frames')
+    try:
+        gen = scoped_generator()
+        assert next(gen) == ['inner']
+        assert hacks.call.whoami() == []  # suspended, out of the call stack
+        assert next(gen) == ['inner']
+        assert list(gen) == []
+    finally:
+        hacks.set_lookup_mode('context')
+
+
+def test_lookup_frames_mode_generator_closed_in_another_thread():
+    hacks.set_lookup_mode('frames')
+    try:
+        gen = scoped_generator()
+        assert next(gen) == ['inner']
+        seen = []
+        def close_inside_use():
+            with hacks.use(outer):
+                gen.close()
+                seen.append(deep(5))
+        thread = threading.Thread(target=close_inside_use)
+        thread.start()
+        thread.join()
+        assert seen == [['outer']]
+        assert deep(5) == []
+    finally:
+        hacks.set_lookup_mode('context')
+
+
+def test_lookup_frames_mode_generator_resumed_in_another_thread():
+    hacks.set_lookup_mode('frames')
+    try:
+        gen = scoped_generator()
+        assert next(gen) == ['inner']
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(next(gen)))
+        thread.start()
+        thread.join()
+        assert seen == [['inner']]
+        assert list(gen) == []
+    finally:
+        hacks.set_lookup_mode('context')
+
+
+def test_lookup_unknown_mode():
+    try:
+        hacks.set_lookup_mode('psychic')
+    except ValueError:
+        pass
+    else:
+        assert False
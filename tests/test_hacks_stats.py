@@ -0,0 +1,172 @@
+import asyncio
+import concurrent.futures
+import time
+
+import hacks
+
+
+#########################################################
+# hacks.stats(): dispatch counters and cache statistics #
+#########################################################
+
+@hacks.into('checked')
+def fast_check(x):
+    return x
+
+
+@hacks.into('checked')
+def slow_check(x):
+    time.sleep(.001)
+    return -x
+
+
+@hacks.into('checked')
+@hacks.stealing
+def stealing_check(x, y=hacks.steal):
+    return y
+
+
+@hacks.friendly('greeting')
+def greeting():
+    return 'hi'
+
+
+@hacks.around('greeting')
+def shouting(func):
+    return lambda: func().upper()
+
+
+def test_stats_disabled_by_default():
+    hacks.stats(reset=True)
+    with hacks.use(fast_check):
+        assert hacks.call.checked(1) == [1]
+        assert greeting() == 'hi'
+    assert hacks.stats() == ([], [])
+
+
+def test_stats_dispatch():
+    hacks.stats(reset=True)
+    hacks.enable_stats()
+    try:
+        with hacks.use(fast_check, slow_check, stealing_check):
+            y = 'stolen'
+            for i in range(10):
+                assert hacks.call.checked(i) == [i, -i, 'stolen']
+            assert hacks.call.unhooked() == []
+    finally:
+        hacks.disable_stats()
+
+    points = {point.name: point for point in hacks.stats().points}
+    assert points['unhooked'].calls == 1 and points['unhooked'].hooks == 0
+    checked = points['checked']
+    assert checked.calls == 10 and checked.hooks == 3
+    hooks = {h.hook.rsplit('.', 1)[-1]: h for h in checked.hook_stats}
+    assert set(hooks) == {'fast_check', 'slow_check', 'stealing_check'}
+    assert all(h.calls == 10 for h in hooks.values())
+    assert hooks['slow_check'].time >= .01
+    assert hooks['slow_check'].p50 > hooks['fast_check'].p99
+    assert hooks['slow_check'].p50 <= hooks['slow_check'].p99
+    assert hooks['stealing_check'].steal_time > 0
+    assert hooks['fast_check'].steal_time == 0
+    assert checked.time >= hooks['slow_check'].time
+
+    # Disabled again: back to the plain dispatchers, nothing counted
+    with hacks.use(fast_check, slow_check, stealing_check):
+        y = 'stolen'
+        hacks.call.checked(0)
+    points = {point.name: point for point in hacks.stats().points}
+    assert points['checked'].calls == 10
+    assert hacks.stats(reset=True).points
+    assert hacks.stats().points == []
+
+
+def make_check(result):
+    @hacks.into('checked')
+    def check(x):
+        return result
+    return check
+
+
+def test_stats_same_named_hooks():
+    first, second = make_check('first'), make_check('second')
+    hacks.stats(reset=True)
+    hacks.enable_stats()
+    try:
+        with hacks.use(first, second):
+            assert hacks.call.checked(0) == ['first', 'second']
+            assert hacks.call.checked(0) == ['first', 'second']
+    finally:
+        hacks.disable_stats()
+
+    (checked,) = [p for p in hacks.stats().points if p.name == 'checked']
+    assert checked.hooks == 2
+    assert [h.hook.rsplit('.', 1)[-1] for h in checked.hook_stats] == [
+        'check', 'check']
+    assert [h.calls for h in checked.hook_stats] == [2, 2]
+
+
+def test_stats_caches():
+    hacks.stats(reset=True)
+    hacks.enable_stats()
+    try:
+        for _ in range(2):
+            with hacks.use(shouting):
+                assert greeting() == 'HI'
+                assert greeting() == 'HI'
+        with hacks.use(shouting, only=True):  # the same, interned registry
+            assert greeting() == 'HI'
+        with hacks.use(shouting, interned=False):  # a new one
+            assert greeting() == 'HI'
+        hacks.clear_wrapper_caches()
+        with hacks.use(shouting):  # the interned one again
+            assert greeting() == 'HI'
+    finally:
+        hacks.disable_stats()
+
+    caches = [c for c in hacks.stats().caches if c.names == ('greeting',)]
+    assert len(caches) == 1
+    assert caches[0].kind == 'friendly'
+    assert (caches[0].hits, caches[0].misses, caches[0].rewraps) == (4, 2, 1)
+
+
+def test_stats_variants():
+    hacks.stats(reset=True)
+    hacks.enable_stats()
+    try:
+        with hacks.use(fast_check, slow_check):
+            assert list(hacks.call_iter.checked(1)) == [1, -1]
+            assert hacks.call_first.checked(2) == 2  # slow_check not called
+            assert list(hacks.call_map.checked([3, 4])) == [[3, -3], [4, -4]]
+            assert asyncio.run(hacks.acall.checked(5)) == [5, -5]
+            with concurrent.futures.ThreadPoolExecutor(2) as pool:
+                assert hacks.call_on(pool).checked(6) == [6, -6]
+    finally:
+        hacks.disable_stats()
+
+    (checked,) = [p for p in hacks.stats().points if p.name == 'checked']
+    assert checked.calls == 5 and checked.hooks == 2
+    hooks = {h.hook.rsplit('.', 1)[-1]: h for h in checked.hook_stats}
+    assert hooks['fast_check'].calls == 6
+    assert hooks['slow_check'].calls == 5
+    assert hooks['slow_check'].time >= .005
+    assert checked.time >= hooks['slow_check'].time
+
+
+def test_stats_concurrent():
+    def check_a_lot(i):
+        for _ in range(500):
+            hacks.call.checked(i)
+
+    hacks.stats(reset=True)
+    hacks.enable_stats()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            with hacks.use(fast_check):
+                list(pool.map(hacks.wrap_task(check_a_lot), range(8)))
+                hacks.call_on(pool).checked(0)
+    finally:
+        hacks.disable_stats()
+
+    (checked,) = [p for p in hacks.stats().points if p.name == 'checked']
+    assert checked.calls == 8 * 500 + 1
+    assert [h.calls for h in checked.hook_stats] == [8 * 500 + 1]
@@ -63,3 +63,62 @@ def test_context_aware_hack():
         ('normal_function_b', (1,), {'b': 3}, True),
         ('test_context_aware_hack', ('note that',), {}, False),
     ]
+
+
+##############################################################
+# @hacks.stealing: frameinfo is only built for those who ask #
+##############################################################
+
+def test_frameinfo_is_lazy():
+    import inspect
+    original_getframeinfo = inspect.getframeinfo
+    getframeinfo_calls = []
+    def counting_getframeinfo(*a, **kwa):
+        getframeinfo_calls.append(a)
+        return original_getframeinfo(*a, **kwa)
+    inspect.getframeinfo = counting_getframeinfo
+    try:
+        del storage[:]
+        with hacks.use(store):
+            normal_function_123()
+        assert storage == [1, 2, 3]
+        assert not getframeinfo_calls
+
+        del call_log[:]
+        with hacks.use(context_aware_hack):
+            normal_function_a()
+        assert call_log == [('normal_function_a', (), {}, False)]
+        assert len(getframeinfo_calls) == 1
+    finally:
+        inspect.getframeinfo = original_getframeinfo
+
+
+############################################################
+# @hacks.stealing: methods, renaming and precomputed plans #
+############################################################
+
+def normal_function_xy():
+    x, y = 'ex', 'why'
+    return hacks.call.xy(), hacks.call.xy('given')
+
+
+class Stealer:
+    @hacks.into('xy')
+    @hacks.stealing
+    def steal_xy(self, x=hacks.steal, why=hacks.steal('y')):
+        return x + '/' + why
+
+
+def test_steal_plan():
+    assert Stealer.steal_xy.__hacks_stealer__ == (('x', 1, 'x'),
+                                                  ('why', 2, 'y'))
+    import inspect
+    original_signature = inspect.signature
+    def forbidden_signature(*a, **kwa):
+        raise AssertionError('inspect.signature() called')
+    with hacks.use(Stealer):
+        inspect.signature = forbidden_signature
+        try:
+            assert normal_function_xy() == (['ex/why'], ['given/why'])
+        finally:
+            inspect.signature = original_signature
@@ -69,3 +69,32 @@ def test_hacks_up():
 
     with hacks.use(hack_multiplier):
         assert a.m(4) == '<<8>>'
+
+
+##################################################################
+# Nested @hacks.up: start from the class hacked by the outer scope #
+##################################################################
+
+hacked_up = []
+
+@hacks.up('Duck')
+def exclaiming_duck(DuckToPatch):
+    hacked_up.append(DuckToPatch.__name__)
+    class ExclaimingDuck(DuckToPatch):
+        def quack(self):
+            return super().quack() + '!'
+    return ExclaimingDuck
+
+
+def test_hacks_up_nested_incrementally():
+    del hacked_up[:]
+    duck = Duck()
+    with hacks.use(woofing_duck, interned=False):
+        assert duck.quack() == 'woof'
+        with hacks.use(exclaiming_duck):
+            assert duck.quack() == 'woof!'
+            with hacks.use(stuttering_duck):
+                assert duck.quack() == 'wo-woof!'
+            assert duck.quack() == 'woof!'
+    assert hacked_up == ['WoofingDuck']
+    assert duck.quack() == 'quack'
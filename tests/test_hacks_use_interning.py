@@ -0,0 +1,65 @@
+import hacks
+
+
+###########################################################
+# hacks.use: registries are reused for the same hack sets #
+###########################################################
+
+@hacks.into('count')
+def one():
+    return 1
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    @hacks.into('count')
+    def count(self):
+        self.calls += 1
+        return self.calls
+
+
+@hacks.stateful
+class StatefulCounter(Counter):
+    pass
+
+
+wraps = []
+
+@hacks.friendly('greeting')
+def greeting():
+    return 'hi'
+
+
+@hacks.around('greeting')
+def shout(func):
+    wraps.append(func)
+    return lambda: func().upper()
+
+
+def test_use_is_interned():
+    assert hacks.use(one) is hacks.use(one)
+    assert hacks.use(one) is not hacks.use(one, interned=False)
+    assert hacks.use(one) is not hacks.use(one, Counter)
+    with hacks.use(one):
+        assert hacks.use(Counter) is hacks.use(Counter)
+        assert hacks.use(Counter) is not hacks.use(Counter, only=True)
+
+
+def test_use_interned_keeps_instances_and_wrappers():
+    del wraps[:]
+    for i in range(3):
+        with hacks.use(Counter, shout):
+            assert hacks.call.count() == [i + 1]
+            assert greeting() == 'HI'
+    assert len(wraps) == 1
+
+
+def test_use_stateful_opt_out():
+    for i in range(3):
+        with hacks.use(StatefulCounter):
+            assert hacks.call.count() == [1]
+    for i in range(3):
+        with hacks.use(Counter, interned=False):
+            assert hacks.call.count() == [1]
@@ -0,0 +1,82 @@
+import gc
+
+import hacks
+
+
+################################################################
+# Caches of friendly objects and classes don't keep registries #
+################################################################
+
+@hacks.friendly('cached_func')
+def cached_func():
+    return 'original'
+
+
+@hacks.friendly_class('CachedClass')
+class CachedClass:
+    def who(self):
+        return 'original'
+
+
+@hacks.around('cached_func')
+def wrap_func(func):
+    return lambda: 'wrapped'
+
+
+@hacks.up('CachedClass')
+def wrap_class(cls):
+    class Wrapped(cls):
+        def who(self):
+            return 'wrapped'
+    return Wrapped
+
+
+def cache_sizes():
+    return {info.names: info.size for info in hacks.wrapper_cache_info()
+            if info.names in (('cached_func',), ('CachedClass',))}
+
+
+def test_wrapper_caches_are_weak():
+    instance = CachedClass()
+    hacks.clear_wrapper_caches()
+    assert cache_sizes() == {('cached_func',): 0, ('CachedClass',): 0}
+
+    with hacks.use(wrap_func, wrap_class, interned=False):
+        assert cached_func() == 'wrapped'
+        assert instance.who() == 'wrapped'
+        assert cache_sizes() == {('cached_func',): 1, ('CachedClass',): 1}
+    assert cached_func() == 'original'
+    assert instance.who() == 'original'
+    gc.collect()
+    assert cache_sizes() == {('cached_func',): 0, ('CachedClass',): 0}
+
+
+def test_wrapper_caches_clear():
+    with hacks.use(wrap_func):
+        assert cached_func() == 'wrapped'
+    assert cache_sizes()[('cached_func',)] == 1
+    hacks.clear_wrapper_caches()
+    assert cache_sizes()[('cached_func',)] == 0
+    with hacks.use(wrap_func):
+        assert cached_func() == 'wrapped'
+
+
+#######################################################
+# Registries nobody will reuse release wrappers early #
+#######################################################
+
+def test_wrappers_released_on_exit():
+    instance = CachedClass()
+    hacks.clear_wrapper_caches()
+    registry = hacks.use(wrap_func, wrap_class, interned=False)
+    with registry:
+        assert cached_func() == 'wrapped'
+        with registry:
+            assert instance.who() == 'wrapped'
+        assert cache_sizes() == {('cached_func',): 1, ('CachedClass',): 1}
+    assert cache_sizes() == {('cached_func',): 0, ('CachedClass',): 0}
+
+    interned_registry = hacks.use(wrap_func)
+    with interned_registry:
+        assert cached_func() == 'wrapped'
+    assert cache_sizes()[('cached_func',)] == 1